@@ -5,13 +5,15 @@ This module provides a streaming interface to read time-series data from InfluxD
 specifically designed for the Home Assistant to VictoriaMetrics migration.
 """
 
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime, date, timedelta, timezone
-from typing import Iterator, Tuple, Optional, List
+from typing import Any, Dict, Iterable, Iterator, Tuple, Optional, List
 import logging
+import queue
+import threading
 
-from influxdb_client import InfluxDBClient
-from influxdb_client.client.flux_table import FluxTable, FluxRecord
+from influxdb_client import InfluxDBClient, Dialect
 
 
 logger = logging.getLogger(__name__)
@@ -22,16 +24,20 @@ class QueryError(Exception):
     pass
 
 
-@dataclass
+@dataclass(slots=True)
 class InfluxDataPoint:
-    """Represents a single data point from InfluxDB."""
-    timestamp: datetime  # UTC timestamp
-    domain: str          # e.g., "sensor"
-    entity_id: str       # e.g., "temperature_living_room"
-    friendly_name: str   # e.g., "Living Room Temperature"
-    measurement: str     # e.g., "°C" (the unit)
-    field: str           # e.g., "value", "current_temperature", "brightness"
-    value: float         # numeric value
+    """
+    Represents a single data point from InfluxDB.
+
+    Uses __slots__ since one instance is allocated per record read.
+    """
+    timestamp: datetime    # UTC timestamp
+    domain: str            # e.g., "sensor"
+    entity_id: str         # e.g., "temperature_living_room"
+    friendly_name: str     # e.g., "Living Room Temperature" ("" if not set)
+    measurement: str       # e.g., "°C" (the unit)
+    value: float           # numeric value
+    field: str = "value"   # e.g., "value", "current_temperature", "brightness"
 
 
 # Default fields to query - 'value' is the standard HA field
@@ -44,6 +50,134 @@ EXTENDED_FIELDS = {
     "light": ["value", "brightness"],
 }
 
+# Parallel range queries hand points from worker threads to the consumer in
+# chunks, with a bounded number of chunks buffered per day window
+_CHUNK_SIZE = 1000
+_MAX_BUFFERED_CHUNKS = 16
+
+# Marks the end of a day window's stream in its queue
+_END_OF_WINDOW = object()
+
+# Plain CSV with a header row per table; annotations are not needed because
+# every column we read is parsed explicitly
+CSV_DIALECT = Dialect(header=True, annotations=[])
+
+# Drops _start, _stop and unrelated tags server-side, so each CSV row is
+# shorter to send and split; the CSV encoder still adds result and table
+KEEP_CSV_COLUMNS = (
+    '|> keep(columns: ["_time", "_value", "_field", "_measurement", '
+    '"domain", "entity_id", "friendly_name"])'
+)
+
+# Unix epoch and one millisecond; (dt - UNIX_EPOCH) // ONE_MILLISECOND is an
+# exact integer, unlike int(dt.timestamp() * 1000) which rounds through a float
+UNIX_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+ONE_MILLISECOND = timedelta(milliseconds=1)
+
+# Length of an RFC3339 UTC timestamp truncated to microseconds, without the "Z"
+_FLUX_TIME_US_LEN = len("2024-01-02T03:04:05.123456")
+
+
+def parse_flux_time(value: str) -> datetime:
+    """
+    Parse an RFC3339 timestamp from CSV query results into an aware UTC datetime.
+
+    Flux emits UTC timestamps with up to nanosecond precision (e.g.
+    "2024-01-02T03:04:05.123456789Z"); digits past microseconds are dropped
+    so the string can be handled by datetime.fromisoformat at C speed.
+
+    Args:
+        value: Timestamp string from the _time column
+
+    Returns:
+        Timezone-aware datetime in UTC
+    """
+    if value.endswith("Z"):
+        value = value[:-1][:_FLUX_TIME_US_LEN]
+        return datetime.fromisoformat(value).replace(tzinfo=timezone.utc)
+    return datetime.fromisoformat(value)
+
+
+def format_flux_time(value: datetime) -> str:
+    """
+    Format a UTC datetime as a second-precision RFC3339 Flux time literal.
+
+    Built with an f-string rather than strftime, which is several times
+    slower and runs for every query issued.
+
+    Args:
+        value: UTC datetime (naive values are taken to be UTC)
+
+    Returns:
+        Timestamp string such as "2024-01-02T03:04:05Z"
+    """
+    return (
+        f"{value.year:04d}-{value.month:02d}-{value.day:02d}"
+        f"T{value.hour:02d}:{value.minute:02d}:{value.second:02d}Z"
+    )
+
+
+def _flux_string(value: str) -> str:
+    """Quote a value as a Flux string literal."""
+    escaped = value.replace("\\", "\\\\").replace('"', '\\"').replace("${", "\\${")
+    return f'"{escaped}"'
+
+
+def generate_date_range(start: date, end: date) -> Iterator[date]:
+    """
+    Generate the dates from start to end (inclusive).
+
+    Args:
+        start: Start date
+        end: End date
+
+    Returns:
+        Iterator of dates; its length is (end - start).days + 1, or 0 if end < start
+    """
+    return (start + timedelta(days=i) for i in range((end - start).days + 1))
+
+
+def raise_for_error_table(header: List[str], rows: Iterator[List[str]]) -> None:
+    """
+    Raise if a CSV table header starts an InfluxDB error table.
+
+    Args:
+        header: Header row of the table
+        rows: Remaining CSV rows; the error row is consumed from it
+
+    Raises:
+        QueryError: If the table reports a query error
+    """
+    if len(header) > 2 and header[1] == "error" and header[2] == "reference":
+        error_row = next(rows, None)
+        raise QueryError(error_row[1] if error_row else "InfluxDB returned an error table")
+
+
+class CsvColumns:
+    """
+    Positions of the standard columns in a Flux CSV table, resolved from its header row.
+
+    Rows are then read positionally (row[columns.value]) instead of through
+    per-record dict lookups. Tag columns missing from the table are None.
+    """
+
+    __slots__ = ("time", "measurement", "field", "value", "domain", "entity_id", "friendly_name")
+
+    def __init__(self, header: List[str]):
+        index = {name: i for i, name in enumerate(header)}
+        self.time = index["_time"]
+        self.measurement = index["_measurement"]
+        self.field = index["_field"]
+        self.value = index["_value"]
+        self.domain = index.get("domain")
+        self.entity_id = index.get("entity_id")
+        self.friendly_name = index.get("friendly_name")
+
+
+# Results of open-ended metadata queries (time range, counts) are reused until
+# the wall clock crosses into the next interval of this length
+METADATA_CACHE_INTERVAL = timedelta(hours=1)
+
 
 class InfluxDBReader:
     """
@@ -61,7 +195,9 @@ class InfluxDBReader:
         bucket: str,
         domains: Optional[List[str]] = None,
         fields: Optional[List[str]] = None,
-        use_extended_fields: bool = False
+        use_extended_fields: bool = False,
+        max_workers: int = 1,
+        exclude_series: Optional[Iterable[Tuple[str, str]]] = None
     ):
         """
         Initialize InfluxDB connection.
@@ -74,6 +210,10 @@ class InfluxDBReader:
             domains: Optional list of domains to filter (None = all domains)
             fields: Optional list of fields to query (None = use defaults)
             use_extended_fields: If True, use EXTENDED_FIELDS per domain
+            max_workers: Number of per-day queries query_range() runs concurrently
+                         (1 = a single query for the whole range)
+            exclude_series: Optional (domain, measurement) pairs whose "value"
+                            field is dropped server-side by range queries
         """
         self.url = url
         self.token = token
@@ -82,6 +222,16 @@ class InfluxDBReader:
         self.domains = domains
         self.fields = fields
         self.use_extended_fields = use_extended_fields
+        self.max_workers = max(1, max_workers)
+        self.exclude_series = sorted(set(exclude_series or ()))
+        self._metadata_cache: Dict[Tuple, Any] = {}
+
+        # Filter clauses only depend on configuration; build them once rather
+        # than on every range query
+        self._field_filter_clause = self._build_range_field_filter()
+        self._domain_filter_clause = self._build_domain_filter()
+        self._exclude_filter_clause = self._build_exclude_filter()
+
         self._client = None
         self._query_api = None
 
@@ -90,7 +240,9 @@ class InfluxDBReader:
                 url=url,
                 token=token,
                 org=org,
-                timeout=300_000  # 5 minute timeout for large queries
+                timeout=300_000,  # 5 minute timeout for large queries
+                enable_gzip=True,  # Query responses are CSV and compress well
+                connection_pool_maxsize=self.max_workers  # One connection per concurrent day query
             )
             self._query_api = self._client.query_api()
             logger.info(f"Connected to InfluxDB at {url}")
@@ -101,6 +253,19 @@ class InfluxDBReader:
         except Exception as e:
             raise ConnectionError(f"Failed to connect to InfluxDB: {e}")
 
+    def _metadata_cache_key(self, flux_query: str, open_ended: bool) -> Tuple:
+        """
+        Build the cache key for a metadata query.
+
+        Queries whose range ends at "now" are keyed on the current interval
+        boundary so they are re-run once new data may have arrived.
+        """
+        if not open_ended:
+            return (flux_query,)
+        interval_seconds = int(METADATA_CACHE_INTERVAL.total_seconds())
+        now = int(datetime.now(timezone.utc).timestamp())
+        return (flux_query, now - now % interval_seconds)
+
     def _get_fields_for_domain(self, domain: Optional[str] = None) -> List[str]:
         """Get the list of fields to query for a given domain."""
         if self.fields:
@@ -117,6 +282,27 @@ class InfluxDBReader:
         conditions = " or ".join(f'r._field == "{f}"' for f in fields)
         return f"({conditions})"
 
+    def _build_range_field_filter(self) -> str:
+        """Build the Flux field filter step for range queries."""
+        # Fields take precedence, then per-domain extended fields
+        if self.fields:
+            return f"|> filter(fn: (r) => {self._build_field_filter()})"
+        if self.use_extended_fields:
+            return f"|> filter(fn: (r) => {self._build_extended_filter()})"
+        return '|> filter(fn: (r) => r._field == "value")'
+
+    def _build_extended_filter(self) -> str:
+        """
+        Build Flux filter expression for extended fields.
+
+        Only valid (domain, field) combinations are matched, so InfluxDB drops
+        e.g. "brightness" on climate entities instead of shipping it to us.
+        """
+        conditions = [self._build_field_filter()]
+        for domain in EXTENDED_FIELDS:
+            conditions.append(f'(r["domain"] == "{domain}" and {self._build_field_filter(domain)})')
+        return " or ".join(conditions)
+
     def _build_domain_filter(self) -> str:
         """Build Flux filter expression for domains."""
         if not self.domains:
@@ -126,6 +312,32 @@ class InfluxDBReader:
         conditions = " or ".join(f'r["domain"] == "{d}"' for d in self.domains)
         return f"|> filter(fn: (r) => {conditions})"
 
+    def _build_exclude_filter(self) -> str:
+        """
+        Build Flux filter expression dropping the value field of excluded series.
+
+        Only tag comparisons joined by and/or are used: InfluxDB cannot push
+        contains() or not (...) down to the storage engine, and a filter it
+        cannot push down also stops pushdown of any aggregate chained after
+        it, such as the count() of estimate_count().
+        """
+        if not self.exclude_series:
+            return ""
+
+        measurements_by_domain: Dict[str, List[str]] = {}
+        for domain, measurement in self.exclude_series:
+            measurements_by_domain.setdefault(domain, []).append(measurement)
+
+        # not (value field and (domain d and measurement in set) or ...),
+        # rewritten as != comparisons
+        conditions = " and ".join(
+            f'(r["domain"] != {_flux_string(domain)} or ('
+            + " and ".join(f"r._measurement != {_flux_string(m)}" for m in measurements)
+            + "))"
+            for domain, measurements in measurements_by_domain.items()
+        )
+        return f'|> filter(fn: (r) => r._field != "value" or ({conditions}))'
+
     def get_time_range(self) -> Tuple[datetime, datetime]:
         """
         Get the time range of data in the bucket.
@@ -136,49 +348,51 @@ class InfluxDBReader:
         Raises:
             QueryError: If the query fails
         """
+        # Oldest and newest timestamps in one pipeline: first()/last() per
+        # series are pushed down to storage, then reduced across series
         flux_query = f'''
-        from(bucket: "{self.bucket}")
+        data = from(bucket: "{self.bucket}")
           |> range(start: 0)
           |> filter(fn: (r) => r._field == "value")
+
+        oldest = data
+          |> first()
           |> group()
-          |> keep(columns: ["_time"])
           |> min(column: "_time")
-        '''
+          |> keep(columns: ["_time"])
+          |> set(key: "bound", value: "min")
 
-        flux_query_max = f'''
-        from(bucket: "{self.bucket}")
-          |> range(start: 0)
-          |> filter(fn: (r) => r._field == "value")
+        newest = data
+          |> last()
           |> group()
-          |> keep(columns: ["_time"])
           |> max(column: "_time")
+          |> keep(columns: ["_time"])
+          |> set(key: "bound", value: "max")
+
+        union(tables: [oldest, newest])
         '''
 
+        cache_key = self._metadata_cache_key(flux_query, open_ended=True)
+        if cache_key in self._metadata_cache:
+            return self._metadata_cache[cache_key]
+
         try:
-            # Query for minimum time
-            result_min = self._query_api.query(flux_query)
+            result = self._query_api.query(flux_query)
             min_time = None
-            for table in result_min:
-                for record in table.records:
-                    min_time = record.get_time()
-                    break
-                if min_time:
-                    break
-
-            # Query for maximum time
-            result_max = self._query_api.query(flux_query_max)
             max_time = None
-            for table in result_max:
+            for table in result:
                 for record in table.records:
-                    max_time = record.get_time()
-                    break
-                if max_time:
-                    break
+                    bound = record.values.get("bound")
+                    if bound == "min":
+                        min_time = record.get_time()
+                    elif bound == "max":
+                        max_time = record.get_time()
 
             if not min_time or not max_time:
                 raise QueryError("Could not determine time range - bucket may be empty")
 
             logger.info(f"Data range: {min_time} to {max_time}")
+            self._metadata_cache[cache_key] = (min_time, max_time)
             return (min_time, max_time)
 
         except Exception as e:
@@ -207,6 +421,9 @@ class InfluxDBReader:
         """
         Query all data points in a time range.
 
+        With max_workers > 1 the range is split into per-day queries that run
+        concurrently; points are still yielded in day order.
+
         Args:
             start: Start time (inclusive)
             end: End time (exclusive)
@@ -220,83 +437,167 @@ class InfluxDBReader:
         # Ensure timestamps are in UTC
         if start.tzinfo is None:
             start = start.replace(tzinfo=timezone.utc)
+        else:
+            start = start.astimezone(timezone.utc)
         if end.tzinfo is None:
             end = end.replace(tzinfo=timezone.utc)
+        else:
+            end = end.astimezone(timezone.utc)
+
+        if self.max_workers == 1:
+            yield from self._query_window(start, end)
+            return
+
+        windows = self._split_by_day(start, end)
+        if len(windows) <= 1:
+            yield from self._query_window(start, end)
+            return
+
+        yield from self._query_windows_parallel(windows)
+
+    @staticmethod
+    def _split_by_day(start: datetime, end: datetime) -> List[Tuple[datetime, datetime]]:
+        """Split a UTC time range into windows aligned to UTC day boundaries."""
+        windows = []
+        window_start = start
+        while window_start < end:
+            next_day = datetime.combine(
+                window_start.date() + timedelta(days=1),
+                datetime.min.time(),
+                tzinfo=timezone.utc
+            )
+            window_end = min(next_day, end)
+            windows.append((window_start, window_end))
+            window_start = window_end
+        return windows
 
-        # Format timestamps for Flux
-        start_str = start.strftime("%Y-%m-%dT%H:%M:%SZ")
-        end_str = end.strftime("%Y-%m-%dT%H:%M:%SZ")
+    def _query_windows_parallel(
+        self,
+        windows: List[Tuple[datetime, datetime]]
+    ) -> Iterator[InfluxDataPoint]:
+        """
+        Run one query per window on a thread pool and yield results in window order.
 
-        # Build field filter - include all extended fields if enabled
-        if self.use_extended_fields:
-            all_fields = set(DEFAULT_FIELDS)
-            for domain_fields in EXTENDED_FIELDS.values():
-                all_fields.update(domain_fields)
-            field_conditions = " or ".join(f'r._field == "{f}"' for f in sorted(all_fields))
-            field_filter = f"|> filter(fn: (r) => {field_conditions})"
-        elif self.fields:
-            if len(self.fields) == 1:
-                field_filter = f'|> filter(fn: (r) => r._field == "{self.fields[0]}")'
-            else:
-                field_conditions = " or ".join(f'r._field == "{f}"' for f in self.fields)
-                field_filter = f"|> filter(fn: (r) => {field_conditions})"
-        else:
-            field_filter = '|> filter(fn: (r) => r._field == "value")'
+        Each window streams into its own bounded queue, so at most max_workers
+        windows are in flight and memory stays bounded while the consumer
+        drains the earliest window.
+        """
+        stop = threading.Event()
+        queues = [queue.Queue(maxsize=_MAX_BUFFERED_CHUNKS) for _ in windows]
 
-        # Build domain filter
-        domain_filter = self._build_domain_filter()
+        executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="influx-query"
+        )
+        try:
+            for (window_start, window_end), window_queue in zip(windows, queues):
+                executor.submit(self._fill_window_queue, window_start, window_end, window_queue, stop)
+
+            for window_queue in queues:
+                while True:
+                    item = window_queue.get()
+                    if item is _END_OF_WINDOW:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    yield from item
+        finally:
+            # Unblock producers if the consumer stopped early or a query failed
+            stop.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _fill_window_queue(
+        self,
+        start: datetime,
+        end: datetime,
+        window_queue: queue.Queue,
+        stop: threading.Event
+    ) -> None:
+        """Worker: stream one window into its queue in chunks, then an end marker."""
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    window_queue.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        if stop.is_set():
+            return
+
+        try:
+            chunk = []
+            for point in self._query_window(start, end):
+                chunk.append(point)
+                if len(chunk) >= _CHUNK_SIZE:
+                    if not put(chunk):
+                        return
+                    chunk = []
+            if chunk and not put(chunk):
+                return
+        except Exception as e:
+            put(e)
+            return
+
+        put(_END_OF_WINDOW)
+
+    def _query_window(self, start: datetime, end: datetime) -> Iterator[InfluxDataPoint]:
+        """Stream all data points in a UTC time range with a single Flux query."""
+        # Format timestamps for Flux
+        start_str = format_flux_time(start)
+        end_str = format_flux_time(end)
 
         flux_query = f'''
         from(bucket: "{self.bucket}")
           |> range(start: {start_str}, stop: {end_str})
-          {field_filter}
-          {domain_filter}
+          {self._field_filter_clause}
+          {self._domain_filter_clause}
+          {self._exclude_filter_clause}
+          {KEEP_CSV_COLUMNS}
         '''
 
         logger.debug(f"Querying range: {start_str} to {end_str}")
 
         try:
-            # Stream results using query_stream for memory efficiency
-            # query_stream returns an iterator of FluxRecord objects directly
-            records = self._query_api.query_stream(flux_query)
+            # Stream the raw CSV response instead of query_stream(): building a
+            # FluxRecord per row (with per-column type conversion) dominates the
+            # cost of large days, while we only need seven columns
+            rows = iter(self._query_api.query_csv(flux_query, dialect=CSV_DIALECT))
 
             count = 0
-            skipped = 0
-            for record in records:
-                # Extract data from record
-                timestamp = record.get_time()
-                measurement = record.get_measurement()
-                value = record.get_value()
-                field = record.get_field()
-
-                # Get tags (with fallback for missing values)
-                domain = record.values.get("domain", "unknown")
-                entity_id = record.values.get("entity_id", "unknown")
-                friendly_name = record.values.get("friendly_name")
-
-                # When using extended fields, filter to only valid domain+field combos
-                if self.use_extended_fields:
-                    valid_fields = self._get_fields_for_domain(domain)
-                    if field not in valid_fields:
-                        skipped += 1
-                        continue
-
-                # Use entity_id as fallback for missing friendly_name
-                if not friendly_name:
-                    friendly_name = entity_id
+            columns = None
+            for row in rows:
+                # A blank line separates tables; each table starts with its own header
+                if not row:
+                    columns = None
+                    continue
+                if columns is None:
+                    raise_for_error_table(row, rows)
+                    columns = CsvColumns(row)
+                    # Bind positions to locals once per table, not once per row
+                    i_time, i_measurement, i_field, i_value = (
+                        columns.time, columns.measurement, columns.field, columns.value
+                    )
+                    i_domain, i_entity_id, i_friendly_name = (
+                        columns.domain, columns.entity_id, columns.friendly_name
+                    )
+                    continue
 
                 count += 1
                 yield InfluxDataPoint(
-                    timestamp=timestamp,
-                    domain=domain,
-                    entity_id=entity_id,
-                    friendly_name=friendly_name,
-                    measurement=measurement,
-                    field=field,
-                    value=float(value)
+                    timestamp=parse_flux_time(row[i_time]),
+                    domain=row[i_domain] if i_domain is not None else "unknown",
+                    entity_id=row[i_entity_id] if i_entity_id is not None else "unknown",
+                    # Empty when missing; build_vm_labels() falls back to entity_id
+                    friendly_name=row[i_friendly_name] if i_friendly_name is not None else "",
+                    measurement=row[i_measurement],
+                    field=row[i_field],
+                    # CSV cells are text, so float() here is the parse itself
+                    value=float(row[i_value])
                 )
 
-            logger.debug(f"Yielded {count} data points, skipped {skipped}")
+            logger.debug(f"Yielded {count} data points")
 
         except Exception as e:
             raise QueryError(f"Failed to query range {start_str} to {end_str}: {e}")
@@ -319,14 +620,14 @@ class InfluxDBReader:
         if start is None and end is None:
             range_clause = "range(start: 0)"
         elif start is not None and end is None:
-            start_str = start.strftime("%Y-%m-%dT%H:%M:%SZ")
+            start_str = format_flux_time(start)
             range_clause = f"range(start: {start_str})"
         elif start is None and end is not None:
-            end_str = end.strftime("%Y-%m-%dT%H:%M:%SZ")
+            end_str = format_flux_time(end)
             range_clause = f"range(start: 0, stop: {end_str})"
         else:
-            start_str = start.strftime("%Y-%m-%dT%H:%M:%SZ")
-            end_str = end.strftime("%Y-%m-%dT%H:%M:%SZ")
+            start_str = format_flux_time(start)
+            end_str = format_flux_time(end)
             range_clause = f"range(start: {start_str}, stop: {end_str})"
 
         flux_query = f'''
@@ -336,6 +637,10 @@ class InfluxDBReader:
           |> count()
         '''
 
+        cache_key = self._metadata_cache_key(flux_query, open_ended=end is None)
+        if cache_key in self._metadata_cache:
+            return self._metadata_cache[cache_key]
+
         try:
             result = self._query_api.query(flux_query)
 
@@ -348,11 +653,66 @@ class InfluxDBReader:
                         total_count += int(count_value)
 
             logger.info(f"Record count: {total_count}")
+            self._metadata_cache[cache_key] = total_count
             return total_count
 
         except Exception as e:
             raise QueryError(f"Failed to count records: {e}")
 
+    def estimate_count(self, start: datetime, end: datetime) -> int:
+        """
+        Count the records a migration of a time range would read.
+
+        Applies the same field, domain and exclusion filters as query_range().
+        All of them are plain tag comparisons, so InfluxDB pushes them and the
+        count() after them down to the storage engine; only one row per series
+        is summed rather than every point being scanned.
+
+        Args:
+            start: Start time (inclusive)
+            end: End time (exclusive)
+
+        Returns:
+            Number of records query_range() would yield for the range
+
+        Raises:
+            QueryError: If the query fails
+        """
+        start_str = format_flux_time(start)
+        end_str = format_flux_time(end)
+
+        flux_query = f'''
+        from(bucket: "{self.bucket}")
+          |> range(start: {start_str}, stop: {end_str})
+          {self._field_filter_clause}
+          {self._domain_filter_clause}
+          {self._exclude_filter_clause}
+          |> count()
+          |> group()
+          |> sum()
+        '''
+
+        cache_key = self._metadata_cache_key(flux_query, open_ended=False)
+        if cache_key in self._metadata_cache:
+            return self._metadata_cache[cache_key]
+
+        try:
+            result = self._query_api.query(flux_query)
+
+            total_count = 0
+            for table in result:
+                for record in table.records:
+                    count_value = record.get_value()
+                    if count_value is not None:
+                        total_count += int(count_value)
+
+            logger.info(f"Estimated record count: {total_count:,}")
+            self._metadata_cache[cache_key] = total_count
+            return total_count
+
+        except Exception as e:
+            raise QueryError(f"Failed to estimate record count: {e}")
+
     def close(self):
         """Close the InfluxDB connection."""
         if self._client:
@@ -0,0 +1,16 @@
+"""
+Logging Setup for the Migration Scripts
+
+Shared by migrate.py and migrate_hvac_action.py so both entry points log in
+the same format.
+"""
+
+import logging
+
+
+def setup_logging() -> None:
+    """Configure root logging for the migration scripts."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
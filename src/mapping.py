@@ -8,13 +8,15 @@ to VictoriaMetrics metric names and labels according to the SCHEMA_MAPPING.yaml
 
 import logging
 import os
+import re
+import sys
+from collections import Counter
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Optional, List, Tuple, Set
+from typing import Dict, FrozenSet, Optional, List, Tuple
 import yaml
 import requests
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 # Path to the YAML schema file - check multiple locations
@@ -35,6 +37,22 @@ SCHEMA_PATH = _find_schema_path()
 _SCHEMA_MAPPING = None
 _KNOWN_VM_METRICS = None
 
+# VictoriaMetrics URL used when known metrics are fetched lazily
+_VM_URL: Optional[str] = None
+
+# Flattened views of the loaded schema, built once by load_schema():
+#   _SPECIAL_RULES: measurement -> (((lowercased pattern, metric or IGNORE_METRIC), ...), default)
+#   _SPECIAL_MATCHERS: measurement -> regex matching any rule pattern, group N being rule N
+#   _LABEL_TEMPLATE: entity label template, or None if no entity label is computed
+#   _STATIC_LABELS: static labels added to every series
+_SPECIAL_RULES: Dict[str, Tuple[Tuple[Tuple[str, Optional[str]], ...], Optional[str]]] = {}
+_SPECIAL_MATCHERS: Dict[str, re.Pattern] = {}
+_LABEL_TEMPLATE: Optional[str] = None
+_STATIC_LABELS: Dict[str, str] = {}
+
+# Upper bound on memoized lookups; keys are bounded by distinct entities
+_MAPPING_CACHE_SIZE = 65536
+
 # Default VM URL (can be overridden via env var or parameter)
 DEFAULT_VM_URL = os.environ.get(
     "VM_URL",
@@ -42,40 +60,65 @@ DEFAULT_VM_URL = os.environ.get(
 )
 
 
-def fetch_vm_metrics(vm_url: str = DEFAULT_VM_URL) -> Set[str]:
+# Metric name prefixes whose known names are fetched from VictoriaMetrics
+DEFAULT_METRIC_PREFIXES = ("homeassistant_",)
+
+
+def fetch_vm_metrics(
+    vm_url: str = DEFAULT_VM_URL,
+    prefixes: Tuple[str, ...] = DEFAULT_METRIC_PREFIXES,
+    session: Optional[requests.Session] = None
+) -> FrozenSet[str]:
     """
-    Fetch all metric names from VictoriaMetrics that match homeassistant_* pattern.
+    Fetch all metric names from VictoriaMetrics that start with one of the given prefixes.
+
+    All prefixes are sent as match[] selectors of a single label values
+    request, so VictoriaMetrics resolves them in one round-trip.
 
     Args:
         vm_url: VictoriaMetrics server URL
+        prefixes: Metric name prefixes to match (default: homeassistant_)
+        session: Optional requests session to reuse a pooled keep-alive connection
 
     Returns:
-        Set of metric names
+        Frozen set of interned metric names
 
     Raises:
         ConnectionError: If unable to connect to VictoriaMetrics
     """
-    # Use label values API to get all metric names starting with homeassistant_
+    # Use label values API to get all metric names starting with the prefixes
     api_url = f"{vm_url}/api/v1/label/__name__/values"
-    params = {"match[]": "{__name__=~'homeassistant_.*'}"}
+    params = [("match[]", f"{{__name__=~'{prefix}.*'}}") for prefix in prefixes]
 
     try:
-        response = requests.get(api_url, params=params, timeout=30)
+        # requests negotiates gzip by default, which matters for large label sets
+        if session is not None:
+            response = session.get(api_url, params=params, timeout=30)
+        else:
+            with requests.Session() as own_session:
+                response = own_session.get(api_url, params=params, timeout=30)
         response.raise_for_status()
         data = response.json()
 
         if data.get("status") != "success":
             raise ConnectionError(f"VM API returned error: {data.get('error', 'Unknown error')}")
 
-        metrics = set(data.get("data", []))
-        logger.info(f"Fetched {len(metrics)} homeassistant_* metrics from VictoriaMetrics")
+        # Interned names let set membership short-circuit on identity when
+        # checked against the (also interned) names produced by the mapping
+        metrics = frozenset(sys.intern(name) for name in data.get("data", []))
+        logger.info(f"Fetched {len(metrics)} metrics matching {', '.join(p + '*' for p in prefixes)} "
+                    f"from VictoriaMetrics")
         return metrics
 
     except requests.exceptions.RequestException as e:
         raise ConnectionError(f"Failed to fetch metrics from VictoriaMetrics: {e}")
 
 
-def load_schema(path: Optional[str] = None, vm_url: Optional[str] = None) -> Dict:
+def load_schema(
+    path: Optional[str] = None,
+    vm_url: Optional[str] = None,
+    fetch_metrics: bool = True
+) -> Dict:
     """
     Load the schema mapping from YAML file and fetch known metrics from VictoriaMetrics.
 
@@ -83,6 +126,8 @@ def load_schema(path: Optional[str] = None, vm_url: Optional[str] = None) -> Dic
         path: Optional path to the YAML schema file. If None, uses default SCHEMA_PATH.
         vm_url: Optional VictoriaMetrics URL to fetch known metrics from.
                 If None, uses VM_URL env var or default.
+        fetch_metrics: If False, skip the VictoriaMetrics request; known metrics
+                       are then fetched on first strict validation instead.
 
     Returns:
         Parsed YAML schema as a dictionary
@@ -92,7 +137,7 @@ def load_schema(path: Optional[str] = None, vm_url: Optional[str] = None) -> Dic
         yaml.YAMLError: If the YAML file is invalid
         ConnectionError: If unable to connect to VictoriaMetrics
     """
-    global _SCHEMA_MAPPING, _KNOWN_VM_METRICS
+    global _SCHEMA_MAPPING, _KNOWN_VM_METRICS, _VM_URL
 
     schema_file = Path(path) if path else SCHEMA_PATH
 
@@ -120,39 +165,134 @@ def load_schema(path: Optional[str] = None, vm_url: Optional[str] = None) -> Dic
 
     # Cache the schema
     _SCHEMA_MAPPING = schema
+    _compile_schema(schema)
+    clear_mapping_caches()
+
+    if vm_url:
+        _VM_URL = vm_url
 
     # Fetch known metrics from VictoriaMetrics (required - must be reachable)
-    effective_vm_url = vm_url or DEFAULT_VM_URL
-    _KNOWN_VM_METRICS = fetch_vm_metrics(effective_vm_url)
+    if fetch_metrics:
+        _KNOWN_VM_METRICS = frozenset(fetch_vm_metrics(_VM_URL or DEFAULT_VM_URL))
 
     logger.info(f"Loaded schema from {schema_file}")
     return schema
 
 
+def _compile_schema(schema: Dict) -> None:
+    """
+    Precompute the flattened lookup structures used on the per-record path.
+
+    Args:
+        schema: Parsed YAML schema
+    """
+    global _SPECIAL_RULES, _SPECIAL_MATCHERS, _LABEL_TEMPLATE, _STATIC_LABELS
+
+    def rule_result(rule: Dict) -> Optional[str]:
+        return IGNORE_METRIC if rule.get('ignore', False) else rule.get('metric')
+
+    # Intern every configured metric name so lookups against the interned
+    # known-metrics set compare by identity first
+    for section in ('metric_mappings', 'field_mappings', 'special_mappings'):
+        for entries in (schema.get(section) or {}).values():
+            mappings = entries.get('rules', []) if section == 'special_mappings' else entries.values()
+            for mapping_info in mappings:
+                if isinstance(mapping_info, dict) and isinstance(mapping_info.get('metric'), str):
+                    mapping_info['metric'] = sys.intern(mapping_info['metric'])
+
+    special_rules = {}
+    special_matchers = {}
+    for measurement, special in (schema.get('special_mappings') or {}).items():
+        patterns = []
+        default = None
+        for rule in special.get('rules', []):
+            pattern = rule.get('pattern', '').lower()
+            if pattern == 'default':
+                # First default rule wins, matching the original rule scan
+                if default is None:
+                    default = rule_result(rule)
+                continue
+            patterns.append((pattern, rule_result(rule)))
+        special_rules[measurement] = (tuple(patterns), default)
+        if patterns:
+            special_matchers[measurement] = _compile_special_matcher(p for p, _ in patterns)
+
+    labels = schema.get('labels', {})
+    computed_labels = labels.get('computed', {})
+    if 'entity' in computed_labels:
+        label_template = computed_labels['entity'].get('template', '{domain}.{entity_id}')
+    else:
+        label_template = None
+
+    _SPECIAL_RULES = special_rules
+    _SPECIAL_MATCHERS = special_matchers
+    _LABEL_TEMPLATE = label_template
+    _STATIC_LABELS = dict(labels.get('static', {}))
+
+
+def _compile_special_matcher(patterns) -> re.Pattern:
+    """
+    Compile substring patterns into a single regex scanned once per entity_id.
+
+    Each pattern becomes its own capture group inside a lookahead, so overlapping
+    matches are all reported and the group index identifies the rule.
+
+    Args:
+        patterns: Lowercased substring patterns, in rule order
+
+    Returns:
+        Compiled pattern whose match.lastindex is the 1-based rule index
+    """
+    alternation = "|".join(f"({re.escape(pattern)})" for pattern in patterns)
+    return re.compile(f"(?=(?:{alternation}))")
+
+
+def clear_mapping_caches() -> None:
+    """
+    Clear memoized mapping lookups.
+
+    Called whenever a schema is loaded; results computed against a previous
+    schema must not leak into the new one.
+    """
+    is_ignored.cache_clear()
+    get_field_metric.cache_clear()
+    _resolve_vm_metric_name.cache_clear()
+    is_new_metric_allowed.cache_clear()
+    _apply_special_mapping.cache_clear()
+    build_vm_labels.cache_clear()
+
+
 def _get_schema() -> Dict:
     """
     Get the loaded schema, loading it if necessary.
 
+    Loading here does not contact VictoriaMetrics; mapping-only callers never
+    need the known metrics list.
+
     Returns:
         The loaded schema dictionary
     """
     if _SCHEMA_MAPPING is None:
-        load_schema()
+        load_schema(fetch_metrics=False)
     return _SCHEMA_MAPPING
 
 
-def _get_known_metrics() -> set:
+def _get_known_metrics() -> FrozenSet[str]:
     """
-    Get the set of known VM metrics, loading the schema if necessary.
+    Get the set of known VM metrics, fetching them if necessary.
 
     Returns:
-        Set of known VM metric names
+        Frozen set of known VM metric names
     """
+    global _KNOWN_VM_METRICS
+
     if _KNOWN_VM_METRICS is None:
-        load_schema()
+        _get_schema()
+        _KNOWN_VM_METRICS = frozenset(fetch_vm_metrics(_VM_URL or DEFAULT_VM_URL))
     return _KNOWN_VM_METRICS
 
 
+@lru_cache(maxsize=_MAPPING_CACHE_SIZE)
 def is_ignored(domain: str, measurement: str) -> bool:
     """
     Check if a domain/measurement combination should be ignored (skipped).
@@ -174,10 +314,31 @@ def is_ignored(domain: str, measurement: str) -> bool:
     return False
 
 
+def ignored_series() -> List[Tuple[str, str]]:
+    """
+    List the domain/measurement combinations whose "value" records are always skipped.
+
+    These are the metric_mappings entries marked `ignore: true`; readers can
+    drop them server-side, since get_vm_metric_name() would return None for
+    every such record regardless of entity_id.
+
+    Returns:
+        List of (domain, measurement) tuples
+    """
+    schema = _get_schema()
+    return [
+        (domain, measurement)
+        for domain, measurements in (schema.get('metric_mappings') or {}).items()
+        for measurement, mapping_info in (measurements or {}).items()
+        if isinstance(mapping_info, dict) and mapping_info.get('ignore', False)
+    ]
+
+
 # Sentinel value to indicate a record should be ignored
 IGNORE_METRIC = "__IGNORE__"
 
 
+@lru_cache(maxsize=_MAPPING_CACHE_SIZE)
 def get_field_metric(domain: str, field: str) -> Optional[str]:
     """
     Get VM metric name for a specific (domain, field) combination from field_mappings.
@@ -226,6 +387,23 @@ def get_vm_metric_name(
         >>> get_vm_metric_name("climate", "units", "thermostat", field="current_temperature")
         'homeassistant_climate_current_temperature_celsius'
     """
+    # Always call positionally so the cache sees a single key shape
+    return _resolve_vm_metric_name(domain, measurement, entity_id, field)
+
+
+@lru_cache(maxsize=_MAPPING_CACHE_SIZE)
+def _resolve_vm_metric_name(
+    domain: str,
+    measurement: str,
+    entity_id: str,
+    field: str
+) -> Optional[str]:
+    """
+    Memoized implementation of get_vm_metric_name().
+
+    Fallback and missing-mapping warnings are therefore logged once per
+    distinct combination rather than once per record.
+    """
     # For non-'value' fields, check field_mappings first
     if field != "value":
         field_metric = get_field_metric(domain, field)
@@ -268,7 +446,7 @@ def get_vm_metric_name(
             return metric
 
     # Fallback: generate default metric name
-    fallback_metric = f"homeassistant_{domain}_state"
+    fallback_metric = sys.intern(f"homeassistant_{domain}_state")
     logger.warning(
         f"No mapping found for domain='{domain}', measurement='{measurement}', "
         f"entity_id='{entity_id}'. Using fallback: {fallback_metric}"
@@ -276,6 +454,7 @@ def get_vm_metric_name(
     return fallback_metric
 
 
+@lru_cache(maxsize=_MAPPING_CACHE_SIZE)
 def is_new_metric_allowed(domain: str, measurement: str) -> bool:
     """
     Check if a domain/measurement combination is allowed to create new metrics.
@@ -297,6 +476,7 @@ def is_new_metric_allowed(domain: str, measurement: str) -> bool:
     return False
 
 
+@lru_cache(maxsize=_MAPPING_CACHE_SIZE)
 def _apply_special_mapping(measurement: str, entity_id: str) -> Optional[str]:
     """
     Apply special mapping rules for ambiguous units based on entity_id patterns.
@@ -310,45 +490,42 @@ def _apply_special_mapping(measurement: str, entity_id: str) -> Optional[str]:
         IGNORE_METRIC sentinel if pattern is marked as ignore
         None if no pattern matches
     """
-    schema = _get_schema()
-    special_mappings = schema.get('special_mappings', {}).get(measurement, {})
-    rules = special_mappings.get('rules', [])
-
-    # Convert entity_id to lowercase for case-insensitive matching
-    entity_id_lower = entity_id.lower()
-
-    for rule in rules:
-        pattern = rule.get('pattern', '').lower()
-
-        # Skip the default rule for now
-        if pattern == 'default':
-            continue
-
-        # Check if pattern is in entity_id
-        if pattern in entity_id_lower:
-            # Check if this pattern is marked as ignore
-            if rule.get('ignore', False):
-                return IGNORE_METRIC
-            return rule.get('metric')
+    _get_schema()
+    rules, default = _SPECIAL_RULES.get(measurement, ((), None))
+    matcher = _SPECIAL_MATCHERS.get(measurement)
+    if matcher is None:
+        return default
+
+    # Single pass over the lowercased entity_id; the earliest rule that
+    # matches anywhere wins, as with the original in-order substring scan
+    best = None
+    for match in matcher.finditer(entity_id.lower()):
+        index = match.lastindex
+        if best is None or index < best:
+            best = index
+            if best == 1:
+                break
+
+    if best is not None:
+        return rules[best - 1][1]
 
     # Return default if no specific pattern matched
-    for rule in rules:
-        if rule.get('pattern', '').lower() == 'default':
-            if rule.get('ignore', False):
-                return IGNORE_METRIC
-            return rule.get('metric')
+    return default
 
-    return None
 
-
-def build_vm_labels(domain: str, entity_id: str, friendly_name: str) -> Dict[str, str]:
+@lru_cache(maxsize=_MAPPING_CACHE_SIZE)
+def build_vm_labels(domain: str, entity_id: str, friendly_name: Optional[str]) -> Dict[str, str]:
     """
     Build VictoriaMetrics labels for a given entity.
 
+    Results are memoized per entity, so repeated calls return the same dict
+    object: callers must treat it as read-only.
+
     Args:
         domain: HomeAssistant domain (e.g., "sensor", "binary_sensor")
         entity_id: Entity ID without domain prefix (e.g., "temp_room")
-        friendly_name: Human-readable entity name (e.g., "Room Temp")
+        friendly_name: Human-readable entity name (e.g., "Room Temp");
+                       falls back to entity_id when empty or None
 
     Returns:
         Dictionary of labels for VictoriaMetrics
@@ -357,23 +534,20 @@ def build_vm_labels(domain: str, entity_id: str, friendly_name: str) -> Dict[str
         >>> build_vm_labels("sensor", "temp_room", "Room Temp")
         {'entity': 'sensor.temp_room', 'domain': 'sensor', 'friendly_name': 'Room Temp', 'job': 'influxdb-migration', 'instance': 'influxdb-migration'}
     """
-    schema = _get_schema()
+    _get_schema()
     labels = {}
 
     # Computed labels
-    computed_labels = schema.get('labels', {}).get('computed', {})
-    if 'entity' in computed_labels:
+    if _LABEL_TEMPLATE is not None:
         # Build entity with domain prefix according to template
-        template = computed_labels['entity'].get('template', '{domain}.{entity_id}')
-        labels['entity'] = template.format(domain=domain, entity_id=entity_id)
+        labels['entity'] = _LABEL_TEMPLATE.format(domain=domain, entity_id=entity_id)
 
     # Direct mappings
     labels['domain'] = domain
-    labels['friendly_name'] = friendly_name
+    labels['friendly_name'] = friendly_name or entity_id
 
     # Static labels
-    static_labels = schema.get('labels', {}).get('static', {})
-    labels.update(static_labels)
+    labels.update(_STATIC_LABELS)
 
     return labels
 
@@ -473,20 +647,29 @@ def dry_run_validate(records: List[Tuple[str, str, str]]) -> Tuple[int, List[str
         >>> len(errors)
         1
     """
-    success_count = 0
-    errors = []
+    # Count records per distinct combination in C (Counter), then resolve
+    # each combination once; records repeat heavily
+    record_counts = Counter(records)
 
-    for domain, measurement, entity_id in records:
+    errors_by_record: Dict[Tuple[str, str, str], str] = {}
+    success_count = 0
+    for record, count in record_counts.items():
+        domain, measurement, entity_id = record
         try:
             # Try to get the metric name with strict validation
             get_vm_metric_name_strict(domain, measurement, entity_id)
-            success_count += 1
+            success_count += count
         except ValueError as e:
             # Collect the error message
-            error_msg = (
+            errors_by_record[record] = (
                 f"Failed to map record: domain='{domain}', measurement='{measurement}', "
                 f"entity_id='{entity_id}' - {str(e)}"
             )
-            errors.append(error_msg)
+
+    # One error per failing record, in input order
+    if errors_by_record:
+        errors = [errors_by_record[record] for record in records if record in errors_by_record]
+    else:
+        errors = []
 
     return success_count, errors
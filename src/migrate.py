@@ -9,23 +9,41 @@ with support for resumable progress, dry-run validation, and error recovery.
 import argparse
 import logging
 import os
+import queue
+import signal
 import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from collections import defaultdict
 from datetime import datetime, date, timedelta, timezone
-from typing import List, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 
-from influx_reader import InfluxDBReader, InfluxDataPoint
-from vm_writer import VMWriter, VMDataPoint
+from influx_reader import (
+    ONE_MILLISECOND, UNIX_EPOCH, InfluxDBReader, InfluxDataPoint, QueryError, generate_date_range
+)
+from vm_writer import VMWriter, VMBatch, DEFAULT_TARGET_BATCH_BYTES
 from progress import ProgressTracker, MigrationProgress
-from mapping import get_vm_metric_name_strict, build_vm_labels, load_schema, is_ignored
+from log_setup import setup_logging
+from mapping import (
+    get_vm_metric_name_strict, build_vm_labels, load_schema, is_ignored, ignored_series
+)
 
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
+# Batches buffered between a day's reader and its writer threads; bounds
+# memory while letting InfluxDB reads overlap VictoriaMetrics writes
+_MAX_PENDING_BATCHES = 4
+
+# Progress is saved in full once this many days are unsaved or this many
+# seconds have passed since the last save; days in between are only appended
+# to the tracker's checkpoint log
+_PROGRESS_FLUSH_DAYS = 5
+_PROGRESS_FLUSH_SECONDS = 30.0
+
+# Total records assumed for progress reporting when counting them fails
+_FALLBACK_TOTAL_RECORDS = 55_000_000
+
 
 def parse_args():
     """Parse command line arguments."""
@@ -60,6 +78,13 @@ Examples:
         help="Validate without writing data to VictoriaMetrics"
     )
 
+    parser.add_argument(
+        "--validate-then-write",
+        action="store_true",
+        help="Validate while migrating: collect every unmapped combination of a query "
+             "window and fail before recording its progress, replacing a separate --dry-run pass"
+    )
+
     parser.add_argument(
         "--reset",
         action="store_true",
@@ -105,8 +130,53 @@ Examples:
     parser.add_argument(
         "--batch-size",
         type=int,
-        default=10000,
-        help="Number of records per batch (default: %(default)s)"
+        default=5000,
+        help="Maximum number of records per batch (default: %(default)s)"
+    )
+
+    parser.add_argument(
+        "--target-batch-bytes",
+        type=int,
+        default=DEFAULT_TARGET_BATCH_BYTES,
+        help="Shrink batches so each request body stays near this size; 0 disables "
+             "(default: %(default)s)"
+    )
+
+    parser.add_argument(
+        "--no-compression",
+        action="store_true",
+        help="Send uncompressed request bodies to VictoriaMetrics (saves client CPU)"
+    )
+
+    parser.add_argument(
+        "--write-workers",
+        type=int,
+        default=2,
+        help="Concurrent VictoriaMetrics writer threads per day (default: %(default)s)"
+    )
+
+    parser.add_argument(
+        "--query-workers",
+        type=int,
+        default=1,
+        help="Concurrent per-day InfluxDB queries within each --days-per-query "
+             "window (default: %(default)s)"
+    )
+
+    parser.add_argument(
+        "--days-per-query",
+        type=int,
+        default=7,
+        help="Consecutive days fetched with a single InfluxDB query; progress is "
+             "still recorded per day (default: %(default)s)"
+    )
+
+    parser.add_argument(
+        "--day-workers",
+        type=int,
+        default=1,
+        help="Windows of --days-per-query days migrated concurrently, each in its own "
+             "process with its own InfluxDB and VictoriaMetrics connections (default: %(default)s)"
     )
 
     parser.add_argument(
@@ -139,29 +209,83 @@ Examples:
     return parser.parse_args()
 
 
-def generate_date_range(start: date, end: date) -> List[date]:
+def group_into_windows(dates: List[date], max_days: int) -> List[List[date]]:
     """
-    Generate list of dates from start to end (inclusive).
+    Group sorted dates into runs of consecutive days, each at most max_days long.
 
     Args:
-        start: Start date
-        end: End date
+        dates: Sorted dates; gaps (e.g. already migrated days) start a new run
+        max_days: Maximum number of days per run
 
     Returns:
-        List of dates
+        List of runs of consecutive dates
     """
-    dates = []
-    current = start
-    while current <= end:
-        dates.append(current)
-        current += timedelta(days=1)
-    return dates
+    max_days = max(1, max_days)
+    windows: List[List[date]] = []
+    for day in dates:
+        if windows and len(windows[-1]) < max_days and windows[-1][-1] + timedelta(days=1) == day:
+            windows[-1].append(day)
+        else:
+            windows.append([day])
+    return windows
+
+
+def _window_bounds(days: List[date]) -> Tuple[datetime, datetime]:
+    """UTC [start, stop) range covering a run of consecutive days."""
+    start = datetime.combine(days[0], datetime.min.time(), tzinfo=timezone.utc)
+    return start, start + timedelta(days=len(days))
+
+
+# Sentinels for the dry-run resolution table
+_MISS = object()
+_UNMAPPED = object()
+
+
+def _resolve_for_validation(
+    point: InfluxDataPoint,
+    skipped_combinations: set,
+    errors: List[str]
+) -> Optional[str]:
+    """
+    Resolve a combination seen for the first time, logging it if skipped or unmapped.
+
+    Returns:
+        Metric name, None if ignored, or _UNMAPPED if no known metric matches
+    """
+    # Try to map to VM metric
+    try:
+        metric_name = get_vm_metric_name_strict(
+            point.domain,
+            point.measurement,
+            point.entity_id,
+            field=point.field
+        )
+    except ValueError:
+        # Record unmapped combination
+        error_msg = (
+            f"UNMAPPED: domain='{point.domain}', "
+            f"measurement='{point.measurement}', "
+            f"entity_id='{point.entity_id}', "
+            f"field='{point.field}'"
+        )
+        errors.append(error_msg)
+        logger.warning(error_msg)
+        return _UNMAPPED
+
+    if metric_name is None:
+        combination_key = (point.domain, point.measurement, point.field)
+        if combination_key not in skipped_combinations:
+            skipped_combinations.add(combination_key)
+            logger.info(f"  SKIPPED: domain='{point.domain}', measurement='{point.measurement}', field='{point.field}' (ignored in schema)")
+
+    return metric_name
 
 
 def perform_dry_run_validation(
     influx: InfluxDBReader,
     start_date: date,
-    end_date: date
+    end_date: date,
+    days_per_query: int = 1
 ) -> Tuple[int, int, int, List[str]]:
     """
     Validate all mappings in dry-run mode.
@@ -170,6 +294,7 @@ def perform_dry_run_validation(
         influx: InfluxDB reader
         start_date: Start date to validate
         end_date: End date to validate
+        days_per_query: Consecutive days fetched with a single query
 
     Returns:
         Tuple of (total_records, valid_records, skipped_records, error_messages)
@@ -182,65 +307,135 @@ def perform_dry_run_validation(
     skipped_records = 0
     errors = []
 
-    # Track unique unmapped and skipped combinations
-    unmapped_combinations = set()
+    # Track unique skipped combinations
     skipped_combinations = set()
 
-    for current_date in generate_date_range(start_date, end_date):
-        logger.info(f"Validating {current_date}...")
+    # (domain, measurement, entity_id, field) -> metric name, None if ignored,
+    # or _UNMAPPED; each combination is resolved and reported only once
+    resolutions: Dict[Tuple[str, str, str, str], Optional[str]] = {}
+
+    dates = list(generate_date_range(start_date, end_date))
+    for window in group_into_windows(dates, days_per_query):
+        window_label = f"{window[0]}" if len(window) == 1 else f"{window[0]} to {window[-1]}"
+        logger.info(f"Validating {window_label}...")
 
-        day_records = 0
-        day_skipped = 0
-        for point in influx.query_day(current_date):
+        window_records = 0
+        window_skipped = 0
+        for point in influx.query_range(*_window_bounds(window)):
             total_records += 1
-            day_records += 1
+            window_records += 1
 
-            # Try to map to VM metric
-            try:
-                metric_name = get_vm_metric_name_strict(
-                    point.domain,
-                    point.measurement,
-                    point.entity_id,
-                    field=point.field
-                )
+            key = (point.domain, point.measurement, point.entity_id, point.field)
+            metric_name = resolutions.get(key, _MISS)
+            if metric_name is _MISS:
+                metric_name = resolutions[key] = _resolve_for_validation(point, skipped_combinations, errors)
 
-                # None means the record is ignored/skipped
-                if metric_name is None:
-                    skipped_records += 1
-                    day_skipped += 1
-                    combination_key = (point.domain, point.measurement, point.field)
-                    if combination_key not in skipped_combinations:
-                        skipped_combinations.add(combination_key)
-                        logger.info(f"  SKIPPED: domain='{point.domain}', measurement='{point.measurement}', field='{point.field}' (ignored in schema)")
-                else:
-                    valid_records += 1
-
-            except ValueError as e:
-                # Record unmapped combination
-                combination_key = (point.domain, point.measurement, point.entity_id, point.field)
-
-                if combination_key not in unmapped_combinations:
-                    unmapped_combinations.add(combination_key)
-                    error_msg = (
-                        f"UNMAPPED: domain='{point.domain}', "
-                        f"measurement='{point.measurement}', "
-                        f"entity_id='{point.entity_id}', "
-                        f"field='{point.field}'"
-                    )
-                    errors.append(error_msg)
-                    logger.warning(error_msg)
+            # None means the record is ignored/skipped
+            if metric_name is None:
+                skipped_records += 1
+                window_skipped += 1
+            elif metric_name is not _UNMAPPED:
+                valid_records += 1
 
-        logger.info(f"  Validated {day_records:,} records for {current_date} ({day_skipped:,} skipped)")
+        logger.info(f"  Validated {window_records:,} records for {window_label} ({window_skipped:,} skipped)")
 
     return total_records, valid_records, skipped_records, errors
 
 
+class BatchWriterPool:
+    """
+    Writes batches to VictoriaMetrics on background threads.
+
+    The caller keeps reading from InfluxDB while up to `workers` batches are
+    being posted; submit() blocks once _MAX_PENDING_BATCHES are queued.
+    """
+
+    def __init__(self, vm_writer: VMWriter, workers: int):
+        """
+        Start the writer threads.
+
+        Args:
+            vm_writer: VictoriaMetrics writer shared by all threads
+            workers: Number of writer threads
+        """
+        self._vm_writer = vm_writer
+        self._workers = workers
+        self._queue: queue.Queue = queue.Queue(maxsize=_MAX_PENDING_BATCHES)
+        self._failed = threading.Event()
+        self._lock = threading.Lock()
+        self._errors: List[Exception] = []
+        self._batches_sent = 0
+
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="vm-writer")
+        for _ in range(workers):
+            self._executor.submit(self._run)
+
+    def _run(self) -> None:
+        """Worker: write queued batches until the end sentinel (None) arrives."""
+        while True:
+            batch = self._queue.get()
+            if batch is None:
+                return
+            # After a failure keep draining so submit() never blocks forever
+            if self._failed.is_set():
+                continue
+            try:
+                self._vm_writer.write_batch(batch)
+            except Exception as e:
+                with self._lock:
+                    self._errors.append(e)
+                self._failed.set()
+                continue
+            with self._lock:
+                self._batches_sent += 1
+
+    def _raise_if_failed(self) -> None:
+        if self._failed.is_set():
+            with self._lock:
+                raise self._errors[0]
+
+    def submit(self, batch: VMBatch) -> None:
+        """
+        Queue a batch for writing.
+
+        Raises:
+            Exception: The first error raised by a writer thread, if any
+        """
+        self._raise_if_failed()
+        self._queue.put(batch)
+
+    def close(self) -> int:
+        """
+        Wait for all queued batches to be written and stop the threads.
+
+        Returns:
+            Number of batches written
+
+        Raises:
+            Exception: The first error raised by a writer thread, if any
+        """
+        for _ in range(self._workers):
+            self._queue.put(None)
+        self._executor.shutdown(wait=True)
+        self._raise_if_failed()
+        return self._batches_sent
+
+    def abort(self) -> None:
+        """Discard queued batches and stop the threads without raising."""
+        self._failed.set()
+        for _ in range(self._workers):
+            self._queue.put(None)
+        self._executor.shutdown(wait=True)
+
+
 def migrate_day(
     influx: InfluxDBReader,
     vm_writer: VMWriter,
     day: date,
     batch_size: int,
-    dry_run: bool
+    dry_run: bool,
+    resolutions: Optional[Dict[Tuple[str, str, str, str], Optional[str]]] = None,
+    write_workers: int = 1
 ) -> Tuple[int, int, int]:
     """
     Migrate a single day of data.
@@ -251,32 +446,152 @@ def migrate_day(
         day: Date to migrate
         batch_size: Batch size for writing
         dry_run: Whether in dry-run mode
+        resolutions: Optional (domain, measurement, entity_id, field) -> metric
+                     table, filled in place; pass the same dict across days
+                     so each series is resolved only once per migration
+        write_workers: Number of threads writing batches while the day is
+                       still being read; 1 writes inline
 
     Returns:
         Tuple of (records_migrated, batches_sent, records_skipped)
     """
-    batch: List[VMDataPoint] = []
+    records_by_day, batches_sent, skipped_count = migrate_window(
+        influx, vm_writer, [day], batch_size, dry_run, resolutions, write_workers
+    )
+    return records_by_day[day], batches_sent, skipped_count
+
+
+def migrate_window(
+    influx: InfluxDBReader,
+    vm_writer: VMWriter,
+    days: List[date],
+    batch_size: int,
+    dry_run: bool,
+    resolutions: Optional[Dict[Tuple[str, str, str, str], Optional[str]]] = None,
+    write_workers: int = 1,
+    unmapped: Optional[List[str]] = None
+) -> Tuple[Dict[date, int], int, int]:
+    """
+    Migrate a run of consecutive days with a single InfluxDB query.
+
+    Points of different series arrive interleaved, so a day is only complete
+    once the whole window is; records are still counted per (UTC) day.
+
+    Args:
+        influx: InfluxDB reader
+        vm_writer: VictoriaMetrics writer
+        days: Consecutive dates to migrate
+        batch_size: Batch size for writing
+        dry_run: Whether in dry-run mode
+        resolutions: Optional shared resolution table, see migrate_day()
+        write_workers: Number of writer threads, see migrate_day()
+        unmapped: Optional list collecting unmapped combinations; when given,
+                  the window is validated and written in one pass instead of
+                  failing on the first unmapped record
+
+    Returns:
+        Tuple of (records_migrated_by_day, batches_sent, records_skipped)
+    """
+    if resolutions is None:
+        resolutions = {}
+
+    # Per-day attribution is only needed when the window spans several days
+    records_by_day: Optional[Dict[date, int]] = defaultdict(int) if len(days) > 1 else None
+
+    pool = BatchWriterPool(vm_writer, write_workers) if write_workers > 1 else None
+    try:
+        records_count, batches_sent, skipped_count = _migrate_points(
+            influx.query_range(*_window_bounds(days)), vm_writer, pool, batch_size, resolutions,
+            records_by_day, unmapped
+        )
+    except BaseException:
+        if pool is not None:
+            pool.abort()
+        raise
+
+    if pool is not None:
+        batches_sent = pool.close()
+
+    if records_by_day is None:
+        records_by_day = {days[0]: records_count}
+    return {day: records_by_day.get(day, 0) for day in days}, batches_sent, skipped_count
+
+
+def _resolve_for_migration(
+    key: Tuple[str, str, str, str],
+    unmapped: Optional[List[str]]
+) -> Optional[str]:
+    """
+    Resolve a combination seen for the first time during migration.
+
+    Returns:
+        Metric name, None if ignored, or _UNMAPPED if collecting unmapped combinations
+
+    Raises:
+        ValueError: If the combination is unmapped and unmapped is None
+    """
+    domain, measurement, entity_id, field = key
+    try:
+        return get_vm_metric_name_strict(domain, measurement, entity_id, field=field)
+    except ValueError as e:
+        if unmapped is None:
+            logger.error(f"Failed to map record: {e}")
+            raise
+        error_msg = (
+            f"UNMAPPED: domain='{domain}', measurement='{measurement}', "
+            f"entity_id='{entity_id}', field='{field}'"
+        )
+        unmapped.append(error_msg)
+        logger.warning(error_msg)
+        return _UNMAPPED
+
+
+def _migrate_points(
+    points: Iterable[InfluxDataPoint],
+    vm_writer: VMWriter,
+    pool: Optional[BatchWriterPool],
+    batch_size: int,
+    resolutions: Dict[Tuple[str, str, str, str], Optional[str]],
+    records_by_day: Optional[Dict[date, int]] = None,
+    unmapped: Optional[List[str]] = None
+) -> Tuple[int, int, int]:
+    """
+    Map and batch points, writing each full batch inline or through the pool.
+
+    If records_by_day is given, migrated records are also counted per UTC day.
+    If unmapped is given, unmapped combinations are appended to it (once each)
+    and their records left out instead of raising on the first one.
+
+    Returns:
+        Tuple of (records_migrated, batches_written_inline, records_skipped)
+    """
+    batch = VMBatch()
     records_count = 0
     batches_sent = 0
     skipped_count = 0
 
-    for point in influx.query_day(day):
+    def send(batch: VMBatch) -> int:
+        if pool is not None:
+            pool.submit(batch)
+            return 0
+        vm_writer.write_batch(batch)
+        return 1
+
+    limit = vm_writer.batch_limit(batch_size)
+
+    for point in points:
         # Transform to VictoriaMetrics format
-        try:
-            metric_name = get_vm_metric_name_strict(
-                point.domain,
-                point.measurement,
-                point.entity_id,
-                field=point.field
-            )
-        except ValueError as e:
-            logger.error(f"Failed to map record: {e}")
-            raise
+        key = (point.domain, point.measurement, point.entity_id, point.field)
+        metric_name = resolutions.get(key, _MISS)
+        if metric_name is _MISS:
+            metric_name = resolutions[key] = _resolve_for_migration(key, unmapped)
 
         # Skip if metric is ignored
         if metric_name is None:
             skipped_count += 1
             continue
+        if metric_name is _UNMAPPED:
+            continue
 
         labels = build_vm_labels(
             point.domain,
@@ -284,35 +599,164 @@ def migrate_day(
             point.friendly_name
         )
 
-        # Convert timestamp to milliseconds
-        timestamp_ms = int(point.timestamp.timestamp() * 1000)
+        # Convert timestamp to milliseconds with integer arithmetic
+        timestamp_ms = (point.timestamp - UNIX_EPOCH) // ONE_MILLISECOND
 
-        vm_point = VMDataPoint(
-            metric_name=metric_name,
-            labels=labels,
-            value=point.value,
-            timestamp_ms=timestamp_ms
-        )
-
-        batch.append(vm_point)
+        batch.append(metric_name, labels, point.value, timestamp_ms)
         records_count += 1
+        if records_by_day is not None:
+            records_by_day[point.timestamp.date()] += 1
 
-        # Write batch when it reaches batch_size
-        if len(batch) >= batch_size:
-            vm_writer.write_batch(batch)
-            batches_sent += 1
-            batch = []
+        # Write batch when it reaches the size tuned to the target body size
+        if len(batch) >= limit:
+            batches_sent += send(batch)
+            batch = VMBatch()
+            limit = vm_writer.batch_limit(batch_size)
 
     # Write remaining records
     if batch:
-        vm_writer.write_batch(batch)
-        batches_sent += 1
+        batches_sent += send(batch)
 
     return records_count, batches_sent, skipped_count
 
 
+# Per-process state of day workers, created once by _init_day_worker()
+_worker_influx: Optional[InfluxDBReader] = None
+_worker_vm_writer: Optional[VMWriter] = None
+_worker_resolutions: Dict[Tuple[str, str, str, str], Optional[str]] = {}
+_worker_args: Optional[argparse.Namespace] = None
+
+
+def _exit_on_sigterm(signum, frame) -> None:
+    """Turn SIGTERM into SystemExit so cleanup and the final progress flush run."""
+    raise SystemExit(128 + signum)
+
+
+def _init_day_worker(args: argparse.Namespace, domains: Optional[List[str]]) -> None:
+    """
+    Process pool initializer: load the schema and open connections once per worker.
+
+    Readers and writers hold sockets and cannot be pickled, so each worker
+    process builds its own.
+    """
+    global _worker_influx, _worker_vm_writer, _worker_args
+
+    setup_logging()
+    load_schema(vm_url=args.vm_url)
+
+    _worker_args = args
+    _worker_influx = InfluxDBReader(
+        url=args.influx_url,
+        token=args.influx_token,
+        org=args.influx_org,
+        bucket=args.influx_bucket,
+        domains=domains,
+        use_extended_fields=args.extended_fields,
+        max_workers=args.query_workers,
+        exclude_series=ignored_series()
+    )
+    _worker_vm_writer = VMWriter(
+        url=args.vm_url,
+        dry_run=args.dry_run,
+        batch_size=args.batch_size,
+        max_connections=args.write_workers,
+        target_batch_bytes=args.target_batch_bytes or None,
+        compress=not args.no_compression
+    )
+
+
+def _migrate_window_in_worker(
+    window: List[date]
+) -> Tuple[Dict[date, int], int, int, Optional[List[str]]]:
+    """Process pool task: migrate one window with this worker's connections."""
+    unmapped: Optional[List[str]] = [] if _worker_args.validate_then_write else None
+    records_by_day, batches, skipped = migrate_window(
+        _worker_influx,
+        _worker_vm_writer,
+        window,
+        _worker_args.batch_size,
+        _worker_args.dry_run,
+        _worker_resolutions,
+        _worker_args.write_workers,
+        unmapped
+    )
+    return records_by_day, batches, skipped, unmapped
+
+
+def migrate_days_parallel(
+    args: argparse.Namespace,
+    domains: Optional[List[str]],
+    dates: List[date],
+    tracker: ProgressTracker,
+    progress: MigrationProgress
+) -> int:
+    """
+    Migrate windows of days concurrently on a process pool, recording each day as it completes.
+
+    Dates are grouped into windows of --days-per-query days, one InfluxDB
+    query each. Windows finish out of order, so progress is tracked as a set
+    of completed dates. The first failing window stops the pool.
+
+    Args:
+        args: Parsed command line arguments
+        domains: Optional domain filter
+        dates: Dates to migrate
+        tracker: Progress tracker
+        progress: Progress to update
+
+    Returns:
+        Total number of records skipped
+
+    Raises:
+        Exception: The error of the first window that failed
+    """
+    total_skipped = 0
+    windows = group_into_windows(dates, args.days_per_query)
+    workers = max(1, min(args.day_workers, len(windows)))
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_day_worker,
+        initargs=(args, domains)
+    ) as executor:
+        futures = {executor.submit(_migrate_window_in_worker, window): window for window in windows}
+        try:
+            for idx, future in enumerate(as_completed(futures), 1):
+                window = futures[future]
+                window_label = f"{window[0]}" if len(window) == 1 else f"{window[0]} to {window[-1]}"
+                try:
+                    records_by_day, batches, skipped, unmapped = future.result()
+
+                    # Unmapped records were left out, so the window is incomplete
+                    if unmapped:
+                        raise ValueError(
+                            f"{len(unmapped)} unmapped combinations found; fix SCHEMA_MAPPING.yaml "
+                            f"and resume"
+                        )
+                except Exception as e:
+                    logger.error(f"Failed to migrate {window_label}: {e}")
+                    tracker.mark_failed(progress, f"Failed on {window_label}: {str(e)}")
+                    raise
+
+                total_skipped += skipped
+                for current_date in window:
+                    day_batches = batches if current_date == window[-1] else 0
+                    tracker.update(progress, current_date, records_by_day[current_date], day_batches)
+                logger.info(f"[{idx}/{len(windows)}] Completed {window_label}: "
+                            f"{sum(records_by_day.values()):,} records, {batches} batches, "
+                            f"{skipped:,} skipped")
+        except BaseException:
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+
+    return total_skipped
+
+
 def main():
     """Main migration orchestrator."""
+    setup_logging()
+    signal.signal(signal.SIGTERM, _exit_on_sigterm)
+
     args = parse_args()
 
     logger.info("=" * 80)
@@ -334,7 +778,11 @@ def main():
         logger.info("Extended fields enabled for climate, cover, light")
 
     # Initialize progress tracker
-    tracker = ProgressTracker(args.state_dir)
+    tracker = ProgressTracker(
+        args.state_dir,
+        flush_interval=_PROGRESS_FLUSH_SECONDS,
+        flush_every=_PROGRESS_FLUSH_DAYS
+    )
 
     # Handle reset flag
     if args.reset:
@@ -381,7 +829,11 @@ def main():
             org=args.influx_org,
             bucket=args.influx_bucket,
             domains=domains,
-            use_extended_fields=args.extended_fields
+            use_extended_fields=args.extended_fields,
+            max_workers=args.query_workers,
+            # Ignored series are read in a dry run so validation can report
+            # them as skipped; the migration drops them server-side
+            exclude_series=None if args.dry_run else ignored_series()
         )
     except Exception as e:
         logger.error(f"Failed to connect to InfluxDB: {e}")
@@ -389,8 +841,8 @@ def main():
 
     # Parse date range from CLI arguments
     try:
-        start_date = datetime.strptime(args.start_date, "%Y-%m-%d").date()
-        end_date = datetime.strptime(args.end_date, "%Y-%m-%d").date()
+        start_date = date.fromisoformat(args.start_date)
+        end_date = date.fromisoformat(args.end_date)
         oldest_ts = datetime.combine(start_date, datetime.min.time()).replace(tzinfo=timezone.utc)
         newest_ts = datetime.combine(end_date, datetime.max.time()).replace(tzinfo=timezone.utc)
         logger.info(f"Migration date range:")
@@ -402,12 +854,19 @@ def main():
         influx.close()
         return 1
 
-    # Estimate total records (avoid slow count query)
-    total_records = 55_000_000  # Approximate from previous analysis
-    logger.info(f"  Estimated total records: ~{total_records:,}")
-
     # Create or update progress
     if not progress:
+        # Per-series counts are summed server-side, so this is far cheaper
+        # than reading the range
+        try:
+            total_records = influx.estimate_count(
+                oldest_ts, datetime.combine(end_date + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+            )
+        except QueryError as e:
+            logger.warning(f"Could not count records, assuming ~{_FALLBACK_TOTAL_RECORDS:,}: {e}")
+            total_records = _FALLBACK_TOTAL_RECORDS
+        logger.info(f"  Estimated total records: ~{total_records:,}")
+
         progress = tracker.create_new(
             total_records=total_records,
             oldest=oldest_ts,
@@ -420,7 +879,10 @@ def main():
     vm_writer = VMWriter(
         url=args.vm_url,
         dry_run=args.dry_run,
-        batch_size=args.batch_size
+        batch_size=args.batch_size,
+        max_connections=args.write_workers,
+        target_batch_bytes=args.target_batch_bytes or None,
+        compress=not args.no_compression
     )
 
     # Health check (skip in dry-run)
@@ -437,8 +899,12 @@ def main():
     start_date = oldest_ts.date()
     end_date = newest_ts.date()
 
-    # Resume from last migrated date if available
-    if progress.last_migrated_date:
+    # Resume: skip days already recorded as completed. State files written
+    # before completed_dates existed only know the last migrated date.
+    completed_dates = set(progress.completed_dates)
+    if completed_dates:
+        logger.info(f"Resuming: {len(completed_dates)} days already completed")
+    elif progress.last_migrated_date:
         resume_date = date.fromisoformat(progress.last_migrated_date)
         start_date = resume_date + timedelta(days=1)
         logger.info(f"Resuming from {start_date} (last completed: {resume_date})")
@@ -449,7 +915,8 @@ def main():
             total, valid, skipped, errors = perform_dry_run_validation(
                 influx,
                 start_date,
-                end_date
+                end_date,
+                args.days_per_query
             )
 
             logger.info("")
@@ -504,34 +971,61 @@ def main():
         logger.info("STARTING MIGRATION")
         logger.info("=" * 80)
 
-        dates_to_migrate = generate_date_range(start_date, end_date)
+        dates_to_migrate = [
+            day for day in generate_date_range(start_date, end_date)
+            if day.isoformat() not in completed_dates
+        ]
         total_dates = len(dates_to_migrate)
 
         logger.info(f"Migrating {total_dates} days: {start_date} to {end_date}")
 
         total_skipped = 0
-        for idx, current_date in enumerate(dates_to_migrate, 1):
-            logger.info(f"[{idx}/{total_dates}] Processing {current_date}...")
+        resolutions: Dict[Tuple[str, str, str, str], Optional[str]] = {}
+        if args.day_workers > 1 and total_dates > 1:
+            logger.info(f"Migrating up to {args.day_workers} windows concurrently")
+            total_skipped = migrate_days_parallel(args, domains, dates_to_migrate, tracker, progress)
+            dates_to_migrate = []
+
+        days_done = 0
+        for window in group_into_windows(dates_to_migrate, args.days_per_query):
+            window_label = f"{window[0]}" if len(window) == 1 else f"{window[0]} to {window[-1]}"
+            logger.info(f"[{days_done + len(window)}/{total_dates}] Processing {window_label}...")
 
             try:
-                records, batches, skipped = migrate_day(
+                unmapped: Optional[List[str]] = [] if args.validate_then_write else None
+                records_by_day, batches, skipped = migrate_window(
                     influx,
                     vm_writer,
-                    current_date,
+                    window,
                     args.batch_size,
-                    args.dry_run
+                    args.dry_run,
+                    resolutions,
+                    args.write_workers,
+                    unmapped
                 )
 
+                # Unmapped records were left out, so the window is incomplete
+                if unmapped:
+                    raise ValueError(
+                        f"{len(unmapped)} unmapped combinations found; fix SCHEMA_MAPPING.yaml "
+                        f"and resume"
+                    )
+
                 total_skipped += skipped
 
-                # Update progress after each day
-                tracker.update(progress, current_date, records, batches)
+                # Update progress for each day of the window; batches span
+                # days, so they are attributed to the window's last day
+                for current_date in window:
+                    day_batches = batches if current_date == window[-1] else 0
+                    tracker.update(progress, current_date, records_by_day[current_date], day_batches)
+                days_done += len(window)
 
-                logger.info(f"  Completed {current_date}: {records:,} records, {batches} batches, {skipped:,} skipped")
+                logger.info(f"  Completed {window_label}: {sum(records_by_day.values()):,} records, "
+                            f"{batches} batches, {skipped:,} skipped")
 
             except Exception as e:
-                logger.error(f"Failed to migrate {current_date}: {e}")
-                tracker.mark_failed(progress, f"Failed on {current_date}: {str(e)}")
+                logger.error(f"Failed to migrate {window_label}: {e}")
+                tracker.mark_failed(progress, f"Failed on {window_label}: {str(e)}")
                 raise
 
         # Mark as completed
@@ -558,7 +1052,8 @@ def main():
         return 1
 
     finally:
-        # Clean up connections
+        # Save days completed since the last flush, then clean up connections
+        tracker.flush(progress)
         influx.close()
         vm_writer.close()
 
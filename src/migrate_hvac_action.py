@@ -6,6 +6,10 @@ Converts string values like "heating", "idle" to the numeric format used by
 the Home Assistant Prometheus exporter:
   homeassistant_climate_action{action="heating", ...} = 1
 
+By default only the active action is written, plus a 0 for the previous
+action when it changes; --all-actions writes every action at every
+timestamp, exactly as the exporter does.
+
 Usage:
   python migrate_hvac_action.py --dry-run
   python migrate_hvac_action.py --start-date 2024-01-01 --end-date 2025-11-30
@@ -15,21 +19,22 @@ import argparse
 import logging
 import os
 from datetime import datetime, date, timedelta, timezone
-from typing import Iterator, List, Optional, Dict, Any
+from functools import lru_cache
+from typing import Iterator, List, Optional, Dict, Any, Tuple
 from dataclasses import dataclass
 
-from influxdb_client import InfluxDBClient
-from vm_writer import VMWriter, VMDataPoint
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+from influxdb_client import InfluxDBClient, QueryApi
+from influx_reader import (
+    CSV_DIALECT, KEEP_CSV_COLUMNS, ONE_MILLISECOND, UNIX_EPOCH, CsvColumns, format_flux_time,
+    generate_date_range, parse_flux_time, raise_for_error_table
 )
+from vm_writer import VMWriter, VMBatch, DEFAULT_TARGET_BATCH_BYTES
+from log_setup import setup_logging
+
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+@dataclass(slots=True)
 class HvacActionPoint:
     """Represents an hvac_action data point."""
     timestamp: datetime
@@ -96,105 +101,198 @@ def parse_args():
     parser.add_argument(
         "--batch-size",
         type=int,
-        default=10000,
-        help="Batch size for writing"
+        default=5000,
+        help="Maximum batch size for writing"
+    )
+
+    parser.add_argument(
+        "--target-batch-bytes",
+        type=int,
+        default=DEFAULT_TARGET_BATCH_BYTES,
+        help="Shrink batches so each request body stays near this size; 0 disables"
+    )
+
+    parser.add_argument(
+        "--no-compression",
+        action="store_true",
+        help="Send uncompressed request bodies to VictoriaMetrics (saves client CPU)"
+    )
+
+    parser.add_argument(
+        "--all-actions",
+        action="store_true",
+        help="Write all actions (0 or 1) at every timestamp instead of only the active one"
     )
 
     return parser.parse_args()
 
 
 def query_hvac_action(
-    client: InfluxDBClient,
+    query_api: QueryApi,
     bucket: str,
     start: datetime,
     end: datetime
 ) -> Iterator[HvacActionPoint]:
-    """Query hvac_action_str from InfluxDB."""
-
-    query_api = client.query_api()
+    """Query hvac_action_str from InfluxDB through a shared query API."""
 
-    start_str = start.strftime("%Y-%m-%dT%H:%M:%SZ")
-    end_str = end.strftime("%Y-%m-%dT%H:%M:%SZ")
+    start_str = format_flux_time(start)
+    end_str = format_flux_time(end)
 
     query = f'''
     from(bucket: "{bucket}")
       |> range(start: {start_str}, stop: {end_str})
       |> filter(fn: (r) => r["domain"] == "climate")
       |> filter(fn: (r) => r._field == "hvac_action_str")
+      {KEEP_CSV_COLUMNS}
     '''
 
-    tables = query_api.query(query)
+    # Read CSV rows positionally rather than building a FluxRecord per row
+    rows = iter(query_api.query_csv(query, dialect=CSV_DIALECT))
 
-    for table in tables:
-        for record in table.records:
-            action = record.get_value()
+    columns = None
+    for row in rows:
+        # A blank line separates tables; each table starts with its own header
+        if not row:
+            columns = None
+            continue
+        if columns is None:
+            raise_for_error_table(row, rows)
+            columns = CsvColumns(row)
+            # Bind positions to locals once per table, not once per row
+            i_time, i_value = columns.time, columns.value
+            i_entity_id, i_friendly_name = columns.entity_id, columns.friendly_name
+            continue
 
-            # Skip empty or invalid actions
-            if not action or not isinstance(action, str):
-                continue
+        action = row[i_value]
 
-            entity_id = record.values.get("entity_id", "unknown")
-            friendly_name = record.values.get("friendly_name", entity_id)
+        # Skip empty actions
+        if not action:
+            continue
 
-            yield HvacActionPoint(
-                timestamp=record.get_time(),
-                entity_id=entity_id,
-                friendly_name=friendly_name,
-                action=action.lower()  # Normalize to lowercase
-            )
+        entity_id = row[i_entity_id] if i_entity_id is not None else "unknown"
+        friendly_name = row[i_friendly_name] if i_friendly_name is not None else None
+
+        yield HvacActionPoint(
+            timestamp=parse_flux_time(row[i_time]),
+            entity_id=entity_id,
+            friendly_name=friendly_name or entity_id,
+            action=action.lower()  # Normalize to lowercase
+        )
 
 
 # All possible HVAC actions (from Home Assistant)
 ALL_HVAC_ACTIONS = ["heating", "idle", "cooling", "off", "drying", "fan", "preheating", "defrosting"]
 
 
-def build_vm_datapoints(point: HvacActionPoint) -> List[VMDataPoint]:
+# Metric all hvac action samples are written to
+HVAC_ACTION_METRIC = "homeassistant_climate_action"
+
+# Per-action values in ALL_HVAC_ACTIONS order, for writing all actions at once:
+# one dict lookup per point instead of comparing against every action
+_ACTION_VALUES: Dict[str, Tuple[float, ...]] = {
+    active: tuple(1.0 if action == active else 0.0 for action in ALL_HVAC_ACTIONS)
+    for active in ALL_HVAC_ACTIONS
+}
+_NO_ACTION_VALUES = (0.0,) * len(ALL_HVAC_ACTIONS)
+
+
+@lru_cache(maxsize=None)
+def _warn_unknown_action(action: str) -> None:
+    """Warn, once per value, that an action outside ALL_HVAC_ACTIONS gets no series."""
+    logger.warning(f"Skipping unknown hvac_action '{action}': not in ALL_HVAC_ACTIONS")
+
+
+@lru_cache(maxsize=4096)
+def _entity_labels(entity_id: str, friendly_name: str) -> Dict[str, str]:
+    """Labels shared by all action series of one entity."""
+    return {
+        "entity": f"climate.{entity_id}",
+        "domain": "climate",
+        "friendly_name": friendly_name,
+        "job": "influxdb-migration",
+        "instance": "influxdb-migration"
+    }
+
+
+@lru_cache(maxsize=4096)
+def _action_labels(entity_id: str, friendly_name: str, action: str) -> Dict[str, str]:
+    """
+    Build the labels of one entity's action series.
+
+    Cached per series; the returned dict is shared and must not be mutated.
+    """
+    return {**_entity_labels(entity_id, friendly_name), "action": action}
+
+
+@lru_cache(maxsize=4096)
+def _all_action_labels(entity_id: str, friendly_name: str) -> Tuple[Dict[str, str], ...]:
+    """Labels of one entity's series for every action, in ALL_HVAC_ACTIONS order."""
+    return tuple(_action_labels(entity_id, friendly_name, action) for action in ALL_HVAC_ACTIONS)
+
+
+def build_vm_datapoints(
+    point: HvacActionPoint,
+    batch: Optional[VMBatch] = None,
+    previous_series: Optional[Tuple[str, str]] = None,
+    all_actions: bool = False
+) -> VMBatch:
     """
-    Build VMDataPoints from HvacActionPoint.
+    Append the VictoriaMetrics samples of an HvacActionPoint to a batch.
+
+    By default writes the active action with value=1. When the action or the
+    friendly name changed from previous_series, that series also gets value=0
+    one millisecond earlier, so it ends cleanly instead of lingering until the
+    lookback window expires. Actions outside ALL_HVAC_ACTIONS (e.g.
+    "unavailable") only end the previous series and get none of their own.
 
-    Creates one data point for each possible action:
+    With all_actions, creates one data point for each possible action:
     - Active action gets value=1
     - All other actions get value=0
 
-    This matches the format used by the Home Assistant Prometheus exporter.
+    This matches the format used by the Home Assistant Prometheus exporter,
+    at eight samples per input point.
+
+    Args:
+        point: hvac_action point to convert
+        batch: Batch to append to; a new one is created if omitted
+        previous_series: (friendly_name, action) of the series last set to 1
+                         for this entity, if any
+        all_actions: Write every action instead of only the active one
+
+    Returns:
+        The batch the samples were appended to
     """
-    timestamp_ms = int(point.timestamp.timestamp() * 1000)
-    datapoints = []
-
-    for action in ALL_HVAC_ACTIONS:
-        labels = {
-            "entity": f"climate.{point.entity_id}",
-            "domain": "climate",
-            "friendly_name": point.friendly_name,
-            "action": action,
-            "job": "influxdb-migration",
-            "instance": "influxdb-migration"
-        }
-
-        # Value is 1 if this is the active action, 0 otherwise
-        value = 1.0 if action == point.action else 0.0
-
-        datapoints.append(VMDataPoint(
-            metric_name="homeassistant_climate_action",
-            labels=labels,
-            value=value,
-            timestamp_ms=timestamp_ms
-        ))
-
-    return datapoints
-
-
-def generate_date_range(start: date, end: date) -> List[date]:
-    """Generate list of dates from start to end (inclusive)."""
-    dates = []
-    current = start
-    while current <= end:
-        dates.append(current)
-        current += timedelta(days=1)
-    return dates
+    if batch is None:
+        batch = VMBatch()
+
+    append = batch.append
+    entity_id = point.entity_id
+    friendly_name = point.friendly_name
+    active = point.action
+    timestamp_ms = (point.timestamp - UNIX_EPOCH) // ONE_MILLISECOND
+
+    if all_actions:
+        labels_by_action = _all_action_labels(entity_id, friendly_name)
+        # Value is 1 for the active action, 0 for all others
+        values = _ACTION_VALUES.get(active, _NO_ACTION_VALUES)
+        for labels, value in zip(labels_by_action, values):
+            append(HVAC_ACTION_METRIC, labels, value, timestamp_ms)
+        return batch
+
+    if previous_series is not None and previous_series != (friendly_name, active):
+        previous_friendly_name, previous_action = previous_series
+        append(HVAC_ACTION_METRIC, _action_labels(entity_id, previous_friendly_name, previous_action),
+               0.0, timestamp_ms - 1)
+    if active in _ACTION_VALUES:
+        append(HVAC_ACTION_METRIC, _action_labels(entity_id, friendly_name, active), 1.0, timestamp_ms)
+    else:
+        _warn_unknown_action(active)
+    return batch
 
 
 def main():
+    setup_logging()
+
     args = parse_args()
 
     logger.info("=" * 80)
@@ -207,50 +305,68 @@ def main():
         logger.info("MODE: PRODUCTION")
 
     # Parse dates
-    start_date = datetime.strptime(args.start_date, "%Y-%m-%d").date()
-    end_date = datetime.strptime(args.end_date, "%Y-%m-%d").date()
+    start_date = date.fromisoformat(args.start_date)
+    end_date = date.fromisoformat(args.end_date)
 
     logger.info(f"Date range: {start_date} to {end_date}")
 
-    # Connect to InfluxDB
+    # Connect to InfluxDB; one client and query API (and so one keep-alive
+    # connection pool) serve every day's query
     client = InfluxDBClient(
         url=args.influx_url,
         token=args.influx_token,
         org=args.influx_org,
-        timeout=300_000
+        timeout=300_000,
+        enable_gzip=True
     )
+    query_api = client.query_api()
     logger.info(f"Connected to InfluxDB: {args.influx_url}")
 
     # Initialize VM writer
     vm_writer = VMWriter(
         url=args.vm_url,
         dry_run=args.dry_run,
-        batch_size=args.batch_size
+        batch_size=args.batch_size,
+        target_batch_bytes=args.target_batch_bytes or None,
+        compress=not args.no_compression
     )
 
     # Process each day
     total_records = 0
     total_batches = 0
-    dates = generate_date_range(start_date, end_date)
+    total_days = (end_date - start_date).days + 1
 
-    for i, day in enumerate(dates):
-        logger.info(f"[{i+1}/{len(dates)}] Processing {day}...")
+    # (friendly_name, action) of the series last set to 1 per entity, carried
+    # across days so a transition closes exactly that series
+    open_series_by_entity: Dict[str, Tuple[str, str]] = {}
+
+    for i, day in enumerate(generate_date_range(start_date, end_date)):
+        logger.info(f"[{i+1}/{total_days}] Processing {day}...")
 
         start_dt = datetime.combine(day, datetime.min.time(), tzinfo=timezone.utc)
         end_dt = start_dt + timedelta(days=1)
 
-        batch: List[VMDataPoint] = []
+        batch = VMBatch()
         day_records = 0
 
-        for point in query_hvac_action(client, args.influx_bucket, start_dt, end_dt):
-            vm_points = build_vm_datapoints(point)  # Returns 8 points (one per action)
-            batch.extend(vm_points)
+        for point in query_hvac_action(query_api, args.influx_bucket, start_dt, end_dt):
+            build_vm_datapoints(
+                point,
+                batch,
+                previous_series=open_series_by_entity.get(point.entity_id),
+                all_actions=args.all_actions
+            )
+            if point.action in _ACTION_VALUES:
+                open_series_by_entity[point.entity_id] = (point.friendly_name, point.action)
+            else:
+                # No series was opened for an unknown action
+                open_series_by_entity.pop(point.entity_id, None)
             day_records += 1
 
-            if len(batch) >= args.batch_size:
+            if len(batch) >= vm_writer.batch_limit():
                 vm_writer.write_batch(batch)
                 total_batches += 1
-                batch = []
+                batch = VMBatch()
 
         # Write remaining
         if batch:
@@ -262,6 +378,7 @@ def main():
             logger.info(f"  {day}: {day_records} records")
 
     client.close()
+    vm_writer.close()
 
     logger.info("=" * 80)
     logger.info("MIGRATION COMPLETE")
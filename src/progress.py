@@ -5,19 +5,84 @@ Provides resumable migration capabilities by persisting progress to a JSON state
 Supports atomic writes, backup, and comprehensive status tracking.
 """
 
+import errno
 import json
 import logging
 import os
 import shutil
-from dataclasses import dataclass, asdict
-from datetime import datetime, date
+import time
+from dataclasses import dataclass, field, fields
+from datetime import datetime, date, timezone
 from pathlib import Path
-from typing import Optional, List
+from typing import Iterator, Optional, List
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+try:
+    import orjson
+except ImportError:  # optional speedup; stdlib json produces the same file
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
+# errno values meaning the filesystem or platform cannot create and publish
+# unnamed (O_TMPFILE) files; saving then falls back to a named temp file
+_UNNAMED_TEMP_UNSUPPORTED = {errno.EOPNOTSUPP, errno.EISDIR, errno.EINVAL, errno.ENOENT}
+
+# Most recent error messages kept in the state file; older ones are dropped
+# so every save stays the same size however often a migration has failed.
+# The full history is appended to the errors log instead
+MAX_STORED_ERRORS = 100
+
+
+def _utc_now_iso() -> str:
+    """Current UTC time as an ISO string with a Z suffix, to the second."""
+    return f"{datetime.now(timezone.utc).replace(tzinfo=None).isoformat(timespec='seconds')}Z"
+
+
+def _fsync_file(fd: int) -> None:
+    """
+    Flush a file's data to stable storage.
+
+    On macOS fsync() only reaches the drive's cache, so F_FULLFSYNC is used
+    where fcntl offers it, falling back to fsync() on filesystems that do
+    not support it (e.g. SMB).
+    """
+    full_fsync = getattr(fcntl, 'F_FULLFSYNC', None)
+    if full_fsync is not None:
+        try:
+            fcntl.fcntl(fd, full_fsync)
+            return
+        except OSError:
+            pass
+    os.fsync(fd)
+
+
+def _dump_json(data: dict, pretty: bool = False) -> bytes:
+    """Serialize state as compact (or indented) UTF-8 JSON, with orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if pretty else None)
+    if pretty:
+        return json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def _dump_json_line(data: dict) -> bytes:
+    """Serialize a record as one compact UTF-8 JSON line."""
+    return _dump_json(data) + b'\n'
+
 
-@dataclass
+def _load_json(raw: bytes) -> dict:
+    """Parse state JSON bytes, with orjson when available."""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+@dataclass(slots=True)
 class MigrationProgress:
     """
     Represents the current state of a migration.
@@ -29,12 +94,14 @@ class MigrationProgress:
         total_records: Total number of records to migrate
         oldest_timestamp: Oldest data point timestamp (ISO format)
         newest_timestamp: Newest data point timestamp (ISO format)
-        last_migrated_date: Last fully migrated date (YYYY-MM-DD), None if not started
+        last_migrated_date: Latest fully migrated date (YYYY-MM-DD), None if not started
         records_migrated: Total number of records migrated so far
         records_failed: Total number of records that failed
         batches_sent: Total number of batches sent to VictoriaMetrics
-        errors: List of error messages encountered
+        errors: Most recent error messages encountered (up to MAX_STORED_ERRORS)
         dry_run: Whether this is a dry-run migration
+        completed_dates: Every fully migrated date (YYYY-MM-DD); days may
+                         complete out of order when migrated concurrently
     """
     started_at: str
     last_updated: str
@@ -48,15 +115,39 @@ class MigrationProgress:
     batches_sent: int
     errors: List[str]
     dry_run: bool
+    completed_dates: List[str] = field(default_factory=list)
 
     def to_dict(self) -> dict:
-        """Convert to dictionary for JSON serialization."""
-        return asdict(self)
+        """
+        Convert to dictionary for JSON serialization.
+
+        A shallow copy: unlike asdict() the lists are not deep-copied, so the
+        result must be treated as read-only.
+        """
+        return {name: getattr(self, name) for name in _PROGRESS_FIELDS}
 
     @classmethod
     def from_dict(cls, data: dict) -> 'MigrationProgress':
-        """Create instance from dictionary."""
-        return cls(**data)
+        """Create instance from dictionary, keeping only the most recent errors."""
+        progress = cls(**data)
+        del progress.errors[:-MAX_STORED_ERRORS]
+        return progress
+
+
+# Field names of MigrationProgress, in declaration (and file) order
+_PROGRESS_FIELDS = tuple(f.name for f in fields(MigrationProgress))
+
+
+def _apply_day(progress: MigrationProgress, migrated: str, records: int, batches: int) -> None:
+    """Record one migrated day (YYYY-MM-DD) and its counts on a progress state."""
+    if migrated not in progress.completed_dates:
+        progress.completed_dates.append(migrated)
+    # ISO dates compare chronologically as strings
+    if progress.last_migrated_date is None or migrated > progress.last_migrated_date:
+        progress.last_migrated_date = migrated
+    progress.records_migrated += records
+    progress.batches_sent += batches
+    progress.status = "in_progress"
 
 
 class ProgressTracker:
@@ -68,18 +159,38 @@ class ProgressTracker:
     """
 
     PROGRESS_FILENAME = "progress.json"
+    ERRORS_LOG_FILENAME = "progress.errors.log"
+    CHECKPOINTS_FILENAME = "progress.checkpoints.ndjson"
     BACKUP_SUFFIX = ".backup"
 
-    def __init__(self, state_dir: str):
+    def __init__(self, state_dir: str, flush_interval: float = 0.0, flush_every: int = 1):
         """
         Initialize progress tracker.
 
+        By default update() saves after every day. Larger flush settings only
+        append each day to the checkpoint log until either limit is reached;
+        load() replays the log, and flush() folds it into a full save.
+
         Args:
             state_dir: Directory where progress.json will be stored
+            flush_interval: Seconds after the last save at which update() saves again
+            flush_every: Number of updated days after which update() saves again
         """
         self.state_dir = Path(state_dir)
         self.progress_file = self.state_dir / self.PROGRESS_FILENAME
         self.backup_file = self.state_dir / f"{self.PROGRESS_FILENAME}{self.BACKUP_SUFFIX}"
+        self.errors_log = self.state_dir / self.ERRORS_LOG_FILENAME
+        self.checkpoints_file = self.state_dir / self.CHECKPOINTS_FILENAME
+        # Built once rather than on every save()
+        self._temp_file = self.progress_file.with_suffix('.tmp')
+        self._use_unnamed_temp = hasattr(os, 'O_TMPFILE')
+        # Hash of the last saved state, excluding last_updated
+        self._saved_fingerprint: Optional[int] = None
+
+        self._flush_interval = flush_interval
+        self._flush_every = flush_every
+        self._unsaved_days = 0
+        self._last_flush = time.monotonic()
 
         # Ensure state directory exists
         self.state_dir.mkdir(parents=True, exist_ok=True)
@@ -89,6 +200,9 @@ class ProgressTracker:
         """
         Load existing progress from file.
 
+        Days checkpointed by update() after the last save are replayed onto
+        the saved state.
+
         Returns:
             MigrationProgress if file exists and is valid, None otherwise
         """
@@ -97,41 +211,90 @@ class ProgressTracker:
             return None
 
         try:
-            with open(self.progress_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            with open(self.progress_file, 'rb') as f:
+                data = _load_json(f.read())
 
             progress = MigrationProgress.from_dict(data)
+            self._replay_checkpoints(progress)
             logger.info(f"Loaded progress: status={progress.status}, "
                        f"records_migrated={progress.records_migrated:,}, "
                        f"last_migrated_date={progress.last_migrated_date}")
             return progress
 
-        except (json.JSONDecodeError, KeyError, TypeError) as e:
+        # JSONDecodeError (stdlib or orjson) and UnicodeDecodeError are ValueErrors
+        except (ValueError, KeyError, TypeError) as e:
             logger.error(f"Failed to load progress file: {e}")
             logger.warning("Progress file is corrupted or invalid")
             return None
 
+    def _replay_checkpoints(self, progress: MigrationProgress) -> None:
+        """Apply days from the checkpoint log that the saved state does not include yet."""
+        if not self.checkpoints_file.exists():
+            return
+
+        saved_dates = set(progress.completed_dates)
+        with open(self.checkpoints_file, 'rb') as f:
+            for line in f:
+                try:
+                    checkpoint = _load_json(line)
+                except ValueError:
+                    # A torn final line from a crash mid-append
+                    logger.warning("Ignoring incomplete progress checkpoint")
+                    continue
+                if checkpoint["date"] in saved_dates:
+                    continue
+                saved_dates.add(checkpoint["date"])
+                _apply_day(progress, checkpoint["date"], checkpoint["records"], checkpoint["batches"])
+
     def save(self, progress: MigrationProgress) -> None:
         """
         Save progress to file using atomic write.
 
+        Nothing is written if the state is unchanged since this tracker last
+        saved it, apart from last_updated.
+
         Writes to a temporary file first, then renames to prevent corruption.
+        The file is fsynced before the rename and the directory after it, so
+        a power loss leaves either the old or the new state on disk. Where
+        supported (Linux), the temporary file only gets a name once it is
+        complete, so an interrupted write leaves nothing behind.
 
         Args:
             progress: MigrationProgress to save
         """
+        # Skip the write when nothing but last_updated would change
+        data = progress.to_dict()
+        data['last_updated'] = None
+        fingerprint = hash(_dump_json(data))
+        if fingerprint == self._saved_fingerprint:
+            self._unsaved_days = 0
+            self._last_flush = time.monotonic()
+            logger.debug("Progress unchanged since last save, not rewriting")
+            return
+
         # Update last_updated timestamp
-        progress.last_updated = datetime.utcnow().isoformat() + 'Z'
+        progress.last_updated = data['last_updated'] = _utc_now_iso()
+        # Compact unless debugging; indentation roughly doubles the file
+        payload = _dump_json(data, pretty=logger.isEnabledFor(logging.DEBUG))
 
         # Write to temporary file first
-        temp_file = self.progress_file.with_suffix('.tmp')
+        temp_file = self._temp_file
 
         try:
-            with open(temp_file, 'w', encoding='utf-8') as f:
-                json.dump(progress.to_dict(), f, indent=2, ensure_ascii=False)
+            if not self._write_unnamed_temp(temp_file, payload):
+                with open(temp_file, 'wb') as f:
+                    f.write(payload)
+                    f.flush()
+                    _fsync_file(f.fileno())
 
             # Atomic rename (overwrites existing file)
             temp_file.replace(self.progress_file)
+            self._fsync_state_dir()
+            self._saved_fingerprint = fingerprint
+            # Every checkpointed day is now part of the saved state
+            self.checkpoints_file.unlink(missing_ok=True)
+            self._unsaved_days = 0
+            self._last_flush = time.monotonic()
 
             logger.debug(f"Progress saved: status={progress.status}, "
                         f"records={progress.records_migrated:,}")
@@ -143,6 +306,58 @@ class ProgressTracker:
                 temp_file.unlink()
             raise
 
+    def _write_unnamed_temp(self, temp_file: Path, payload: bytes) -> bool:
+        """
+        Write and fsync payload as an unnamed file, then link it as temp_file.
+
+        Returns:
+            True if temp_file was written, False if unnamed files are not
+            supported here (remembered for later saves)
+        """
+        if not self._use_unnamed_temp:
+            return False
+
+        try:
+            fd = os.open(self.state_dir, os.O_TMPFILE | os.O_WRONLY, 0o644)
+        except OSError as e:
+            if e.errno not in _UNNAMED_TEMP_UNSUPPORTED:
+                raise
+            self._use_unnamed_temp = False
+            return False
+
+        try:
+            with open(fd, 'wb', closefd=False) as f:
+                f.write(payload)
+                f.flush()
+                _fsync_file(fd)
+
+            # A leftover from an interrupted save would make the link fail
+            temp_file.unlink(missing_ok=True)
+            # linkat(AT_SYMLINK_FOLLOW) through /proc gives the open file a name
+            proc_fd = os.open('/proc/self/fd', os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.link(str(fd), temp_file, src_dir_fd=proc_fd, follow_symlinks=True)
+            finally:
+                os.close(proc_fd)
+            return True
+        except OSError as e:
+            if e.errno not in _UNNAMED_TEMP_UNSUPPORTED:
+                raise
+            self._use_unnamed_temp = False
+            return False
+        finally:
+            os.close(fd)
+
+    def _fsync_state_dir(self) -> None:
+        """Persist the rename in the state directory; skipped where directories cannot be opened (Windows)."""
+        if not hasattr(os, 'O_DIRECTORY'):
+            return
+        dir_fd = os.open(self.state_dir, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
     def reset(self, backup: bool = True) -> None:
         """
         Reset progress, optionally backing up old file.
@@ -150,23 +365,47 @@ class ProgressTracker:
         Args:
             backup: If True, backup existing progress file before resetting
         """
+        # Create backup with timestamp
+        now = datetime.now(timezone.utc)
+        timestamp = (
+            f"{now.year:04d}{now.month:02d}{now.day:02d}"
+            f"_{now.hour:02d}{now.minute:02d}{now.second:02d}"
+        )
+
+        # The errors log belongs to the migration being reset
+        if self.errors_log.exists():
+            if backup:
+                self.errors_log.replace(self.state_dir / f"progress_{timestamp}.errors.log")
+            else:
+                self.errors_log.unlink()
+
+        # Checkpoints only extend the state being reset
+        self.checkpoints_file.unlink(missing_ok=True)
+
         if not self.progress_file.exists():
             logger.info("No progress file to reset")
             return
 
         if backup:
-            # Create backup with timestamp
-            timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
             backup_file = self.state_dir / f"progress_{timestamp}.backup.json"
 
             try:
-                shutil.copy2(self.progress_file, backup_file)
+                # The original is deleted below, so a hard link is a complete
+                # backup without copying any data
+                try:
+                    os.link(self.progress_file, backup_file)
+                except OSError as e:
+                    # Cross-device, or a filesystem without hard links
+                    if e.errno not in (errno.EXDEV, errno.EPERM, errno.EOPNOTSUPP):
+                        raise
+                    shutil.copy2(self.progress_file, backup_file)
                 logger.info(f"Backed up progress to {backup_file}")
             except Exception as e:
                 logger.error(f"Failed to backup progress file: {e}")
                 raise
 
         # Remove current progress file
+        self._saved_fingerprint = None
         try:
             self.progress_file.unlink()
             logger.info("Progress file reset")
@@ -193,7 +432,7 @@ class ProgressTracker:
         Returns:
             New MigrationProgress instance
         """
-        now = datetime.utcnow().isoformat() + 'Z'
+        now = _utc_now_iso()
 
         progress = MigrationProgress(
             started_at=now,
@@ -225,7 +464,10 @@ class ProgressTracker:
         """
         Update progress after processing a day.
 
-        Automatically saves to file after updating.
+        The day is appended to the checkpoint log right away, one short line
+        instead of a rewrite of the whole state. The full state is saved once
+        flush_every days are unsaved or flush_interval seconds have passed
+        since the last save.
 
         Args:
             progress: MigrationProgress to update
@@ -233,13 +475,22 @@ class ProgressTracker:
             records: Number of records migrated for this date
             batches: Number of batches sent for this date
         """
-        progress.last_migrated_date = migrated_date.isoformat()
-        progress.records_migrated += records
-        progress.batches_sent += batches
-        progress.status = "in_progress"
+        migrated = migrated_date.isoformat()
+        _apply_day(progress, migrated, records, batches)
+
+        # Save to file, unless both flush limits are still ahead; until then
+        # the checkpoint lets load() recover the day
+        self._unsaved_days += 1
+        if (self._unsaved_days >= self._flush_every
+                or time.monotonic() - self._last_flush >= self._flush_interval):
+            self.save(progress)
+        else:
+            with open(self.checkpoints_file, 'ab') as f:
+                f.write(_dump_json_line({"date": migrated, "records": records, "batches": batches}))
 
-        # Save to file
-        self.save(progress)
+        # f-strings are formatted even when INFO is disabled, so check first
+        if not logger.isEnabledFor(logging.INFO):
+            return
 
         # Calculate progress percentage
         if progress.total_records > 0:
@@ -251,6 +502,16 @@ class ProgressTracker:
             logger.info(f"Progress updated: {migrated_date} completed, "
                        f"{progress.records_migrated:,} records")
 
+    def flush(self, progress: MigrationProgress) -> None:
+        """
+        Save progress if update() has recorded days that are not yet saved.
+
+        Args:
+            progress: MigrationProgress to save
+        """
+        if self._unsaved_days:
+            self.save(progress)
+
     def mark_completed(self, progress: MigrationProgress) -> None:
         """
         Mark migration as completed.
@@ -269,12 +530,32 @@ class ProgressTracker:
         """
         Mark migration as failed with error message.
 
+        The message is appended to the errors log, which keeps every error,
+        while the state file only keeps the most recent MAX_STORED_ERRORS.
+
         Args:
             progress: MigrationProgress to mark as failed
             error: Error message describing the failure
         """
         progress.status = "failed"
+        with open(self.errors_log, 'ab') as f:
+            f.write(_dump_json_line({"timestamp": _utc_now_iso(), "error": error}))
         progress.errors.append(error)
+        del progress.errors[:-MAX_STORED_ERRORS]
         self.save(progress)
 
         logger.error(f"Migration marked as failed: {error}")
+
+    def read_errors(self) -> Iterator[str]:
+        """
+        Stream every error recorded by mark_failed(), oldest first.
+
+        Yields:
+            Error messages from the errors log
+        """
+        if not self.errors_log.exists():
+            return
+        with open(self.errors_log, 'rb') as f:
+            for line in f:
+                if line.strip():
+                    yield _load_json(line)["error"]
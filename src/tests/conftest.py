@@ -7,20 +7,22 @@ external dependencies like InfluxDB and VictoriaMetrics.
 
 import pytest
 import sys
+from dataclasses import replace
 from datetime import datetime, timezone
 from pathlib import Path
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
 # Add parent directory to path so we can import local modules
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from influxdb_client.client.flux_table import FluxTable, FluxRecord
-from influx_reader import InfluxDataPoint
+import influx_reader
+from influx_reader import InfluxDBReader, InfluxDataPoint
 from vm_writer import VMDataPoint
 
 
-# Mock VictoriaMetrics metrics for all tests
-MOCK_VM_METRICS = {
+# Mock VictoriaMetrics metrics for all tests; frozen so the fixture can hand
+# the same object to every test and frozenset() in mapping does not copy it
+MOCK_VM_METRICS = frozenset({
     "homeassistant_sensor_temperature_celsius",
     "homeassistant_sensor_battery_percent",
     "homeassistant_sensor_humidity_percent",
@@ -103,172 +105,182 @@ MOCK_VM_METRICS = {
     "homeassistant_automation_triggered_count_created",
     "homeassistant_switch_attr_brightness_pct",
     "homeassistant_switch_attr_color_temp_kelvin",
-}
+})
 
 
-@pytest.fixture(autouse=True)
+def _reset_mapping_state():
+    """Drop cached schema, known metrics and mapping results so they are reloaded."""
+    import mapping
+    mapping._KNOWN_VM_METRICS = None
+    mapping._SCHEMA_MAPPING = None
+    mapping.clear_mapping_caches()
+
+
+@pytest.fixture(scope='session', autouse=True)
 def mock_vm_metrics_fetch():
-    """Auto-use fixture to mock fetch_vm_metrics for all tests."""
-    with patch('mapping.fetch_vm_metrics', return_value=MOCK_VM_METRICS):
-        # Reset the cached metrics so load_schema re-fetches
-        import mapping
-        mapping._KNOWN_VM_METRICS = None
-        mapping._SCHEMA_MAPPING = None
-        yield
+    """
+    Session-wide fixture mocking fetch_vm_metrics for all tests.
+
+    The patch is entered once; the schema and caches loaded under it are
+    shared by every test. Tests that change or count that state request
+    fresh_schema.
+    """
+    with patch('mapping.fetch_vm_metrics', return_value=MOCK_VM_METRICS) as mock_fetch:
+        _reset_mapping_state()
+        yield mock_fetch
+        _reset_mapping_state()
 
 
 @pytest.fixture
-def sample_influx_point():
-    """Fixture for a sample InfluxDB data point."""
-    return InfluxDataPoint(
-        timestamp=datetime(2025, 11, 30, 12, 0, 0, tzinfo=timezone.utc),
-        domain="sensor",
-        entity_id="temperature_living_room",
-        friendly_name="Living Room Temperature",
-        measurement="°C",
-        value=21.5
-    )
+def fresh_schema(mock_vm_metrics_fetch):
+    """Reset mapping state and fetch call counts before and after a test."""
+    _reset_mapping_state()
+    mock_vm_metrics_fetch.reset_mock()
+    yield
+    _reset_mapping_state()
 
 
 @pytest.fixture
-def sample_vm_point():
-    """Fixture for a sample VictoriaMetrics data point."""
-    return VMDataPoint(
-        metric_name="homeassistant_sensor_temperature_celsius",
+def influx_reader_mocks(mocker):
+    """
+    Fixture for an InfluxDBReader wired to a mocked InfluxDBClient.
+
+    InfluxDBClient stays patched for the test, so tests needing other reader
+    options can construct their own reader against the same mocks.
+
+    Returns:
+        Tuple of (mock_client, mock_query_api, reader)
+    """
+    mock_client = MagicMock()
+    mock_query_api = MagicMock()
+    mock_client.query_api.return_value = mock_query_api
+    mocker.patch.object(influx_reader, 'InfluxDBClient', return_value=mock_client)
+    reader = InfluxDBReader("http://localhost:8086", "token", "org", "bucket")
+    return mock_client, mock_query_api, reader
+
+
+# Labels the migration adds to every series
+_BASE_LABELS = {"job": "influxdb-migration", "instance": "influxdb-migration"}
+
+# Sample points are built once at import; the fixtures below hand out copies,
+# so tests may mutate what they get
+_SAMPLE_INFLUX_POINT = InfluxDataPoint(
+    timestamp=datetime(2025, 11, 30, 12, 0, 0, tzinfo=timezone.utc),
+    domain="sensor",
+    entity_id="temperature_living_room",
+    friendly_name="Living Room Temperature",
+    measurement="°C",
+    value=21.5
+)
+
+_SAMPLE_VM_POINT = VMDataPoint(
+    metric_name="homeassistant_sensor_temperature_celsius",
+    labels={
+        "entity": "sensor.temperature_living_room",
+        "domain": "sensor",
+        "friendly_name": "Living Room Temperature",
+        **_BASE_LABELS
+    },
+    value=21.5,
+    timestamp_ms=1732968000000
+)
+
+_BATCH_INFLUX_POINTS = (
+    _SAMPLE_INFLUX_POINT,
+    InfluxDataPoint(
+        timestamp=datetime(2025, 11, 30, 12, 1, 0, tzinfo=timezone.utc),
+        domain="sensor",
+        entity_id="humidity_bathroom",
+        friendly_name="Bathroom Humidity",
+        measurement="%",
+        value=65.3
+    ),
+    InfluxDataPoint(
+        timestamp=datetime(2025, 11, 30, 12, 2, 0, tzinfo=timezone.utc),
+        domain="binary_sensor",
+        entity_id="motion_hallway",
+        friendly_name="Hallway Motion",
+        measurement="units",
+        value=1.0
+    ),
+)
+
+_BATCH_VM_POINTS = (
+    _SAMPLE_VM_POINT,
+    VMDataPoint(
+        metric_name="homeassistant_sensor_humidity_percent",
         labels={
-            "entity": "sensor.temperature_living_room",
+            "entity": "sensor.humidity_bathroom",
             "domain": "sensor",
-            "friendly_name": "Living Room Temperature",
-            "job": "influxdb-migration",
-            "instance": "influxdb-migration"
+            "friendly_name": "Bathroom Humidity",
+            **_BASE_LABELS
         },
-        value=21.5,
-        timestamp_ms=1732968000000
-    )
+        value=65.3,
+        timestamp_ms=1732968060000
+    ),
+    VMDataPoint(
+        metric_name="homeassistant_binary_sensor_state",
+        labels={
+            "entity": "binary_sensor.motion_hallway",
+            "domain": "binary_sensor",
+            "friendly_name": "Hallway Motion",
+            **_BASE_LABELS
+        },
+        value=1.0,
+        timestamp_ms=1732968120000
+    ),
+)
 
 
-@pytest.fixture
-def batch_influx_points():
-    """Fixture for a batch of InfluxDB data points."""
-    return [
-        InfluxDataPoint(
-            timestamp=datetime(2025, 11, 30, 12, 0, 0, tzinfo=timezone.utc),
-            domain="sensor",
-            entity_id="temperature_living_room",
-            friendly_name="Living Room Temperature",
-            measurement="°C",
-            value=21.5
-        ),
-        InfluxDataPoint(
-            timestamp=datetime(2025, 11, 30, 12, 1, 0, tzinfo=timezone.utc),
-            domain="sensor",
-            entity_id="humidity_bathroom",
-            friendly_name="Bathroom Humidity",
-            measurement="%",
-            value=65.3
-        ),
-        InfluxDataPoint(
-            timestamp=datetime(2025, 11, 30, 12, 2, 0, tzinfo=timezone.utc),
-            domain="binary_sensor",
-            entity_id="motion_hallway",
-            friendly_name="Hallway Motion",
-            measurement="units",
-            value=1.0
-        ),
-    ]
+def _copy_vm_point(point):
+    """Copy a VMDataPoint together with its labels dict."""
+    return replace(point, labels=dict(point.labels))
 
 
 @pytest.fixture
-def batch_vm_points():
-    """Fixture for a batch of VictoriaMetrics data points."""
-    return [
-        VMDataPoint(
-            metric_name="homeassistant_sensor_temperature_celsius",
-            labels={
-                "entity": "sensor.temperature_living_room",
-                "domain": "sensor",
-                "friendly_name": "Living Room Temperature",
-                "job": "influxdb-migration",
-                "instance": "influxdb-migration"
-            },
-            value=21.5,
-            timestamp_ms=1732968000000
-        ),
-        VMDataPoint(
-            metric_name="homeassistant_sensor_humidity_percent",
-            labels={
-                "entity": "sensor.humidity_bathroom",
-                "domain": "sensor",
-                "friendly_name": "Bathroom Humidity",
-                "job": "influxdb-migration",
-                "instance": "influxdb-migration"
-            },
-            value=65.3,
-            timestamp_ms=1732968060000
-        ),
-        VMDataPoint(
-            metric_name="homeassistant_binary_sensor_state",
-            labels={
-                "entity": "binary_sensor.motion_hallway",
-                "domain": "binary_sensor",
-                "friendly_name": "Hallway Motion",
-                "job": "influxdb-migration",
-                "instance": "influxdb-migration"
-            },
-            value=1.0,
-            timestamp_ms=1732968120000
-        ),
-    ]
+def sample_influx_point():
+    """Fixture for a sample InfluxDB data point."""
+    return replace(_SAMPLE_INFLUX_POINT)
 
 
 @pytest.fixture
-def mock_flux_record():
-    """Fixture for creating mock InfluxDB FluxRecord objects."""
-    def _create_record(timestamp, domain, entity_id, friendly_name, measurement, value):
-        """
-        Create a mock FluxRecord with necessary attributes.
+def sample_vm_point():
+    """Fixture for a sample VictoriaMetrics data point."""
+    return _copy_vm_point(_SAMPLE_VM_POINT)
 
-        Args:
-            timestamp: datetime object
-            domain: HomeAssistant domain
-            entity_id: Entity ID
-            friendly_name: Friendly name
-            measurement: Unit/measurement
-            value: Numeric value
 
-        Returns:
-            Mock FluxRecord object
-        """
-        record = FluxRecord(0)
-        record.values = {
-            "_time": timestamp,
-            "_measurement": measurement,
-            "_value": value,
-            "domain": domain,
-            "entity_id": entity_id,
-            "friendly_name": friendly_name,
-            "_field": "value"
-        }
-        return record
+@pytest.fixture
+def batch_influx_points():
+    """Fixture for a batch of InfluxDB data points."""
+    return [replace(point) for point in _BATCH_INFLUX_POINTS]
 
-    return _create_record
+
+@pytest.fixture
+def batch_vm_points():
+    """Fixture for a batch of VictoriaMetrics data points."""
+    return [_copy_vm_point(point) for point in _BATCH_VM_POINTS]
 
 
 @pytest.fixture
-def mock_flux_table(mock_flux_record):
-    """Fixture for creating mock InfluxDB FluxTable objects."""
-    def _create_table(records_data):
+def mock_csv_rows():
+    """Fixture for creating mock InfluxDB CSV query results (as returned by query_csv)."""
+    def _create_rows(records_data, field="value"):
         """
-        Create a mock FluxTable with FluxRecord objects.
+        Create CSV rows for a single result table, header row first.
 
         Args:
             records_data: List of tuples (timestamp, domain, entity_id, friendly_name, measurement, value)
+            field: Field name written to every row
 
         Returns:
-            Mock FluxTable object
+            List of CSV rows (lists of strings)
         """
-        table = FluxTable()
-        table.records = [mock_flux_record(*data) for data in records_data]
-        return table
+        rows = [["", "result", "table", "_start", "_stop", "_time", "_value",
+                 "_field", "_measurement", "domain", "entity_id", "friendly_name"]]
+        for timestamp, domain, entity_id, friendly_name, measurement, value in records_data:
+            time_str = timestamp.strftime("%Y-%m-%dT%H:%M:%SZ")
+            rows.append(["", "_result", "0", time_str, time_str, time_str, str(value),
+                         field, measurement, domain, entity_id, friendly_name or ""])
+        return rows
 
-    return _create_table
+    return _create_rows
@@ -6,57 +6,124 @@ ensuring proper data extraction and error handling without requiring a real conn
 """
 
 import pytest
-import sys
 from datetime import datetime, date, timedelta, timezone
 from unittest.mock import Mock, MagicMock
-from pathlib import Path
 
-# Add parent directory to path so we can import local modules
-sys.path.insert(0, str(Path(__file__).parent.parent))
+from influxdb_client.client.flux_table import FluxTable, FluxRecord
 
 import influx_reader
 from influx_reader import InfluxDBReader, InfluxDataPoint, QueryError
 
 
+def _flux_table(*rows):
+    """Build a FluxTable holding one plain FluxRecord per values dict."""
+    table = FluxTable()
+    table.records = [FluxRecord(0, values) for values in rows]
+    return table
+
+
+# Timestamp and point shared by the InfluxDataPoint tests; read-only
+_POINT_TS = datetime(2025, 11, 30, 12, 0, 0, tzinfo=timezone.utc)
+_SAMPLE_POINT = InfluxDataPoint(
+    timestamp=_POINT_TS,
+    domain="sensor",
+    entity_id="temp",
+    friendly_name="Temp",
+    measurement="°C",
+    value=21.5
+)
+
+
 class TestInfluxDataPoint:
     """Tests for the InfluxDataPoint dataclass."""
 
     def test_dataclass_creation(self):
         """Test creating an InfluxDataPoint."""
-        point = InfluxDataPoint(
-            timestamp=datetime(2025, 11, 30, 12, 0, 0, tzinfo=timezone.utc),
-            domain="sensor",
-            entity_id="temperature_living_room",
-            friendly_name="Living Room Temperature",
-            measurement="°C",
-            value=21.5
-        )
-        assert point.domain == "sensor"
-        assert point.entity_id == "temperature_living_room"
-        assert point.friendly_name == "Living Room Temperature"
-        assert point.measurement == "°C"
-        assert point.value == 21.5
-        assert isinstance(point.timestamp, datetime)
+        assert _SAMPLE_POINT.timestamp == _POINT_TS
+        assert _SAMPLE_POINT.domain == "sensor"
+        assert _SAMPLE_POINT.entity_id == "temp"
+        assert _SAMPLE_POINT.friendly_name == "Temp"
+        assert _SAMPLE_POINT.measurement == "°C"
+        assert _SAMPLE_POINT.value == 21.5
 
     def test_dataclass_equality(self):
         """Test that two InfluxDataPoints with same values are equal."""
-        point1 = InfluxDataPoint(
-            timestamp=datetime(2025, 11, 30, 12, 0, 0, tzinfo=timezone.utc),
+        other = InfluxDataPoint(
+            timestamp=_POINT_TS,
             domain="sensor",
             entity_id="temp",
             friendly_name="Temp",
             measurement="°C",
             value=21.5
         )
-        point2 = InfluxDataPoint(
-            timestamp=datetime(2025, 11, 30, 12, 0, 0, tzinfo=timezone.utc),
+        assert other == _SAMPLE_POINT
+
+    def test_dataclass_default_field(self):
+        """Test that field defaults to the standard 'value' field."""
+        assert _SAMPLE_POINT.field == "value"
+
+    def test_dataclass_uses_slots(self):
+        """Test that InfluxDataPoint instances carry no per-instance __dict__."""
+        point = InfluxDataPoint(
+            timestamp=_POINT_TS,
             domain="sensor",
             entity_id="temp",
             friendly_name="Temp",
             measurement="°C",
-            value=21.5
+            value=21.5,
+            field="current_temperature"
         )
-        assert point1 == point2
+        assert not hasattr(point, "__dict__")
+        assert point.field == "current_temperature"
+
+
+class TestParseFluxTime:
+    """Tests for parse_flux_time()."""
+
+    @pytest.mark.parametrize("value,expected", [
+        ("2025-11-30T12:00:00Z", datetime(2025, 11, 30, 12, 0, 0, tzinfo=timezone.utc)),
+        ("2025-11-30T12:00:00.5Z", datetime(2025, 11, 30, 12, 0, 0, 500000, tzinfo=timezone.utc)),
+        ("2025-11-30T12:00:00.123456789Z", datetime(2025, 11, 30, 12, 0, 0, 123456, tzinfo=timezone.utc)),
+    ])
+    def test_parses_rfc3339_utc(self, value, expected):
+        """Test that Flux timestamps parse to aware UTC datetimes, truncated to microseconds."""
+        result = influx_reader.parse_flux_time(value)
+        assert result == expected
+        assert result.tzinfo == timezone.utc
+
+
+class TestEpochMilliseconds:
+    """Tests for the UNIX_EPOCH / ONE_MILLISECOND conversion."""
+
+    def test_integer_milliseconds_truncate(self):
+        """Test that sub-millisecond digits are dropped without float rounding."""
+        value = datetime(2025, 3, 4, 5, 6, 7, 891999, tzinfo=timezone.utc)
+        result = (value - influx_reader.UNIX_EPOCH) // influx_reader.ONE_MILLISECOND
+        assert isinstance(result, int)
+        assert result == 1741064767891
+
+
+class TestFormatFluxTime:
+    """Tests for format_flux_time()."""
+
+    def test_matches_strftime(self):
+        """Test that the output matches the previous strftime format."""
+        value = datetime(2025, 1, 2, 3, 4, 5, 678, tzinfo=timezone.utc)
+        assert influx_reader.format_flux_time(value) == value.strftime("%Y-%m-%dT%H:%M:%SZ")
+        assert influx_reader.format_flux_time(value) == "2025-01-02T03:04:05Z"
+
+
+class TestGenerateDateRange:
+    """Tests for generate_date_range()."""
+
+    def test_inclusive_range(self):
+        """Test that both endpoints are included."""
+        result = list(influx_reader.generate_date_range(date(2025, 2, 27), date(2025, 3, 1)))
+        assert result == [date(2025, 2, 27), date(2025, 2, 28), date(2025, 3, 1)]
+
+    def test_empty_when_end_before_start(self):
+        """Test that a reversed range yields nothing."""
+        assert list(influx_reader.generate_date_range(date(2025, 3, 2), date(2025, 3, 1))) == []
 
 
 class TestInfluxDBReaderInit:
@@ -89,7 +156,9 @@ class TestInfluxDBReaderInit:
             url="http://localhost:8086",
             token="test-token",
             org="test-org",
-            timeout=300_000
+            timeout=300_000,
+            enable_gzip=True,
+            connection_pool_maxsize=1
         )
 
     def test_initialization_connection_error(self, mocker):
@@ -110,107 +179,141 @@ class TestInfluxDBReaderInit:
 class TestInfluxDBReaderGetTimeRange:
     """Tests for get_time_range() method."""
 
-    def test_get_time_range_success(self, mocker):
+    def test_get_time_range_success(self, influx_reader_mocks):
         """Test successful time range query."""
-        # Setup mocks
-        mock_client = MagicMock()
-        mock_query_api = MagicMock()
-        mock_client.query_api.return_value = mock_query_api
-        mocker.patch.object(influx_reader, 'InfluxDBClient', return_value=mock_client)
+        mock_client, mock_query_api, reader = influx_reader_mocks
 
-        # Create mock records
         min_time = datetime(2025, 5, 3, 0, 0, 0, tzinfo=timezone.utc)
         max_time = datetime(2025, 11, 28, 23, 59, 59, tzinfo=timezone.utc)
 
-        mock_min_record = MagicMock()
-        mock_min_record.get_time.return_value = min_time
+        # A single fused query returns both bounds
+        mock_query_api.query.return_value = [_flux_table(
+            {"_time": min_time, "bound": "min"},
+            {"_time": max_time, "bound": "max"}
+        )]
 
-        mock_max_record = MagicMock()
-        mock_max_record.get_time.return_value = max_time
+        result_min, result_max = reader.get_time_range()
 
-        mock_min_table = MagicMock()
-        mock_min_table.records = [mock_min_record]
+        assert result_min == min_time
+        assert result_max == max_time
+        assert mock_query_api.query.call_count == 1
 
-        mock_max_table = MagicMock()
-        mock_max_table.records = [mock_max_record]
+    def test_get_time_range_is_cached(self, influx_reader_mocks):
+        """Test that repeated get_time_range calls reuse the first result."""
+        mock_client, mock_query_api, reader = influx_reader_mocks
 
-        # Setup query_api to return different results for min and max queries
-        mock_query_api.query.side_effect = [[mock_min_table], [mock_max_table]]
+        min_time = datetime(2025, 5, 3, 0, 0, 0, tzinfo=timezone.utc)
+        max_time = datetime(2025, 11, 28, 23, 59, 59, tzinfo=timezone.utc)
 
-        reader = InfluxDBReader("http://localhost:8086", "token", "org", "bucket")
-        result_min, result_max = reader.get_time_range()
+        mock_query_api.query.return_value = [_flux_table(
+            {"_time": min_time, "bound": "min"},
+            {"_time": max_time, "bound": "max"}
+        )]
 
-        assert result_min == min_time
-        assert result_max == max_time
-        assert mock_query_api.query.call_count == 2
+        assert reader.get_time_range() == (min_time, max_time)
+        assert reader.get_time_range() == (min_time, max_time)
+        assert mock_query_api.query.call_count == 1
 
-    def test_get_time_range_empty_bucket(self, mocker):
+    def test_get_time_range_empty_bucket(self, influx_reader_mocks):
         """Test get_time_range raises QueryError for empty bucket."""
-        mock_client = MagicMock()
-        mock_query_api = MagicMock()
-        mock_client.query_api.return_value = mock_query_api
-        mocker.patch.object(influx_reader, 'InfluxDBClient', return_value=mock_client)
+        mock_client, mock_query_api, reader = influx_reader_mocks
 
         # Return empty results
         mock_query_api.query.return_value = []
 
-        reader = InfluxDBReader("http://localhost:8086", "token", "org", "bucket")
-
         with pytest.raises(QueryError) as exc_info:
             reader.get_time_range()
 
         assert "Could not determine time range" in str(exc_info.value)
 
-    def test_get_time_range_query_failure(self, mocker):
+    def test_get_time_range_query_failure(self, influx_reader_mocks):
         """Test get_time_range handles query failures."""
-        mock_client = MagicMock()
-        mock_query_api = MagicMock()
-        mock_client.query_api.return_value = mock_query_api
-        mocker.patch.object(influx_reader, 'InfluxDBClient', return_value=mock_client)
+        mock_client, mock_query_api, reader = influx_reader_mocks
 
         mock_query_api.query.side_effect = Exception("Query failed")
 
-        reader = InfluxDBReader("http://localhost:8086", "token", "org", "bucket")
-
         with pytest.raises(QueryError) as exc_info:
             reader.get_time_range()
 
         assert "Failed to get time range" in str(exc_info.value)
 
 
+# Timestamps of the query_range scenario rows
+_ROW_TS = datetime(2025, 11, 30, 12, 0, 0, tzinfo=timezone.utc)
+_NEXT_ROW_TS = datetime(2025, 11, 30, 12, 1, 0, tzinfo=timezone.utc)
+
+
 class TestInfluxDBReaderQueryRange:
     """Tests for query_range() method."""
 
-    def test_query_range_success(self, mocker, mock_flux_record):
-        """Test successful range query with data."""
-        mock_client = MagicMock()
-        mock_query_api = MagicMock()
-        mock_client.query_api.return_value = mock_query_api
-        mocker.patch.object(influx_reader, 'InfluxDBClient', return_value=mock_client)
-
-        # Create test data - query_stream returns records directly, not tables
-        records = [
-            mock_flux_record(
-                datetime(2025, 11, 30, 12, 0, 0, tzinfo=timezone.utc),
-                "sensor",
-                "temperature_living_room",
-                "Living Room Temperature",
-                "°C",
-                21.5
-            ),
-            mock_flux_record(
-                datetime(2025, 11, 30, 12, 1, 0, tzinfo=timezone.utc),
-                "sensor",
-                "humidity_bathroom",
-                "Bathroom Humidity",
-                "%",
-                65.3
-            )
-        ]
+    @pytest.mark.parametrize("records,expected", [
+        pytest.param(
+            [
+                (_ROW_TS, "sensor", "temperature_living_room", "Living Room Temperature", "°C", 21.5),
+                (_NEXT_ROW_TS, "sensor", "humidity_bathroom", "Bathroom Humidity", "%", 65.3),
+            ],
+            [
+                InfluxDataPoint(_ROW_TS, "sensor", "temperature_living_room",
+                                "Living Room Temperature", "°C", 21.5),
+                InfluxDataPoint(_NEXT_ROW_TS, "sensor", "humidity_bathroom",
+                                "Bathroom Humidity", "%", 65.3),
+            ],
+            id="success"
+        ),
+        pytest.param([], [], id="empty"),
+        pytest.param(
+            [(_ROW_TS, "sensor", "test_sensor", None, "°C", 21.5)],
+            [InfluxDataPoint(_ROW_TS, "sensor", "test_sensor", "", "°C", 21.5)],
+            id="missing_friendly_name"
+        ),
+    ])
+    def test_query_range(self, influx_reader_mocks, mock_csv_rows, records, expected):
+        """Test that CSV rows are parsed into points in query order."""
+        _, mock_query_api, reader = influx_reader_mocks
+
+        mock_query_api.query_csv.return_value = mock_csv_rows(records) if records else []
+
+        results = list(reader.query_range(datetime(2025, 11, 30, 12, 0, 0, tzinfo=timezone.utc),
+                                          datetime(2025, 11, 30, 13, 0, 0, tzinfo=timezone.utc)))
+
+        assert results == expected
+
+    def test_query_range_naive_bounds_are_utc(self, influx_reader_mocks):
+        """Test that naive bounds are formatted as UTC in the query."""
+        _, mock_query_api, reader = influx_reader_mocks
+
+        mock_query_api.query_csv.return_value = []
+
+        list(reader.query_range(datetime(2025, 11, 30, 12, 0, 0), datetime(2025, 11, 30, 13, 0, 0)))
+
+        flux = mock_query_api.query_csv.call_args[0][0]
+        assert "2025-11-30T12:00:00Z" in flux
+        assert "2025-11-30T13:00:00Z" in flux
+
+    def test_query_range_error(self, influx_reader_mocks):
+        """Test query_range raises QueryError on failure."""
+        _, mock_query_api, reader = influx_reader_mocks
 
-        mock_query_api.query_stream.return_value = records
+        mock_query_api.query_csv.side_effect = Exception("Query failed")
+
+        with pytest.raises(QueryError, match="Failed to query range"):
+            list(reader.query_range(datetime(2025, 11, 30, 12, 0, 0, tzinfo=timezone.utc),
+                                    datetime(2025, 11, 30, 13, 0, 0, tzinfo=timezone.utc)))
+
+    def test_query_range_multiple_tables(self, influx_reader_mocks, mock_csv_rows):
+        """Test that each CSV table is parsed with its own header row."""
+        mock_client, mock_query_api, reader = influx_reader_mocks
+
+        first = mock_csv_rows([
+            (datetime(2025, 11, 30, 12, 0, 0, tzinfo=timezone.utc), "sensor", "temp", "Temp", "°C", 21.5)
+        ])
+        # Second table has a different column layout and no friendly_name column
+        second = [
+            ["", "result", "table", "_time", "_value", "_field", "_measurement", "entity_id", "domain"],
+            ["", "_result", "1", "2025-11-30T12:01:00Z", "1", "value", "units", "motion", "binary_sensor"],
+        ]
 
-        reader = InfluxDBReader("http://localhost:8086", "token", "org", "bucket")
+        mock_query_api.query_csv.return_value = first + [[]] + second
 
         start = datetime(2025, 11, 30, 12, 0, 0, tzinfo=timezone.utc)
         end = datetime(2025, 11, 30, 13, 0, 0, tzinfo=timezone.utc)
@@ -218,203 +321,236 @@ class TestInfluxDBReaderQueryRange:
         results = list(reader.query_range(start, end))
 
         assert len(results) == 2
-        assert results[0].domain == "sensor"
-        assert results[0].entity_id == "temperature_living_room"
-        assert results[0].value == 21.5
-        assert results[1].measurement == "%"
+        assert results[1].domain == "binary_sensor"
+        assert results[1].entity_id == "motion"
+        assert results[1].friendly_name == ""
+        assert results[1].value == 1.0
 
-    def test_query_range_empty_result(self, mocker):
-        """Test query_range with no results."""
-        mock_client = MagicMock()
-        mock_query_api = MagicMock()
-        mock_client.query_api.return_value = mock_query_api
-        mocker.patch.object(influx_reader, 'InfluxDBClient', return_value=mock_client)
+    def test_query_range_excludes_ignored_series(self, influx_reader_mocks):
+        """Test that excluded (domain, measurement) value records are filtered in Flux."""
+        mock_client, mock_query_api, _ = influx_reader_mocks
 
-        mock_query_api.query_stream.return_value = []
+        mock_query_api.query_csv.return_value = []
 
-        reader = InfluxDBReader("http://localhost:8086", "token", "org", "bucket")
+        reader = InfluxDBReader("http://localhost:8086", "token", "org", "bucket",
+                                exclude_series=[("sun", "units"), ("zone", "units"), ("sun", "°")])
+        list(reader.query_range(datetime(2025, 11, 30, 12, 0, 0), datetime(2025, 11, 30, 13, 0, 0)))
 
-        start = datetime(2025, 11, 30, 12, 0, 0, tzinfo=timezone.utc)
-        end = datetime(2025, 11, 30, 13, 0, 0, tzinfo=timezone.utc)
+        flux = mock_query_api.query_csv.call_args[0][0]
+        assert ('|> filter(fn: (r) => r._field != "value" or ('
+                '(r["domain"] != "sun" or (r._measurement != "units" and r._measurement != "°")) and '
+                '(r["domain"] != "zone" or (r._measurement != "units"))))'
+                in flux)
 
-        results = list(reader.query_range(start, end))
-        assert len(results) == 0
+    def test_query_range_keeps_only_read_columns(self, influx_reader_mocks):
+        """Test that unused columns are dropped server-side before the CSV is sent."""
+        mock_client, mock_query_api, reader = influx_reader_mocks
 
-    def test_query_range_handles_missing_friendly_name(self, mocker, mock_flux_record):
-        """Test query_range uses entity_id as fallback for missing friendly_name."""
-        mock_client = MagicMock()
-        mock_query_api = MagicMock()
-        mock_client.query_api.return_value = mock_query_api
-        mocker.patch.object(influx_reader, 'InfluxDBClient', return_value=mock_client)
-
-        # Create record without friendly_name - query_stream returns records directly
-        record = mock_flux_record(
-            datetime(2025, 11, 30, 12, 0, 0, tzinfo=timezone.utc),
-            "sensor",
-            "test_sensor",
-            None,  # No friendly_name
-            "°C",
-            21.5
-        )
+        mock_query_api.query_csv.return_value = []
+
+        list(reader.query_range(datetime(2025, 11, 30, 12, 0, 0), datetime(2025, 11, 30, 13, 0, 0)))
+
+        flux = mock_query_api.query_csv.call_args[0][0]
+        assert influx_reader.KEEP_CSV_COLUMNS in flux
 
-        mock_query_api.query_stream.return_value = [record]
+    def test_query_range_extended_fields_filter_pushed_down(self, influx_reader_mocks):
+        """Test that extended fields are restricted per domain inside the Flux query."""
+        mock_client, mock_query_api, _ = influx_reader_mocks
 
-        reader = InfluxDBReader("http://localhost:8086", "token", "org", "bucket")
+        mock_query_api.query_csv.return_value = []
+
+        reader = InfluxDBReader("http://localhost:8086", "token", "org", "bucket",
+                                use_extended_fields=True)
 
         start = datetime(2025, 11, 30, 12, 0, 0, tzinfo=timezone.utc)
         end = datetime(2025, 11, 30, 13, 0, 0, tzinfo=timezone.utc)
 
-        results = list(reader.query_range(start, end))
+        list(reader.query_range(start, end))
 
-        assert len(results) == 1
-        assert results[0].friendly_name == "test_sensor"
+        flux = mock_query_api.query_csv.call_args[0][0]
+        assert 'r._field == "value" or' in flux
+        assert ('(r["domain"] == "light" and (r._field == "value" or r._field == "brightness"))'
+                in flux)
+        assert ('(r["domain"] == "cover" and (r._field == "value" or r._field == "current_position"))'
+                in flux)
 
-    def test_query_range_adds_utc_timezone(self, mocker):
-        """Test that query_range adds UTC timezone to naive datetimes."""
-        mock_client = MagicMock()
-        mock_query_api = MagicMock()
-        mock_client.query_api.return_value = mock_query_api
-        mocker.patch.object(influx_reader, 'InfluxDBClient', return_value=mock_client)
+class TestInfluxDBReaderParallelQueryRange:
+    """Tests for per-day parallel query_range() with max_workers > 1."""
+
+    def test_parallel_query_range_splits_by_day_in_order(self, influx_reader_mocks, mock_csv_rows):
+        """Test that a multi-day range runs one query per day and yields in day order."""
+        mock_client, mock_query_api, _ = influx_reader_mocks
+
+        def query_csv(flux, **kwargs):
+            # One record per day, keyed off the range start in the query
+            for day in (1, 2, 3):
+                if f"range(start: 2025-11-0{day}T" in flux:
+                    return mock_csv_rows([(
+                        datetime(2025, 11, day, 12, 0, 0, tzinfo=timezone.utc),
+                        "sensor", f"sensor_day_{day}", None, "°C", float(day)
+                    )])
+            return []
+
+        mock_query_api.query_csv.side_effect = query_csv
+
+        reader = InfluxDBReader("http://localhost:8086", "token", "org", "bucket", max_workers=3)
+
+        start = datetime(2025, 11, 1, 0, 0, 0, tzinfo=timezone.utc)
+        end = datetime(2025, 11, 4, 0, 0, 0, tzinfo=timezone.utc)
+
+        results = list(reader.query_range(start, end))
+
+        assert [p.entity_id for p in results] == ["sensor_day_1", "sensor_day_2", "sensor_day_3"]
+        assert mock_query_api.query_csv.call_count == 3
 
-        mock_query_api.query_stream.return_value = []
+    def test_sequential_query_range_uses_single_query(self, influx_reader_mocks):
+        """Test that max_workers=1 issues a single query for a multi-day range."""
+        mock_client, mock_query_api, reader = influx_reader_mocks
 
-        reader = InfluxDBReader("http://localhost:8086", "token", "org", "bucket")
+        mock_query_api.query_csv.return_value = []
 
-        # Use naive datetimes
-        start = datetime(2025, 11, 30, 12, 0, 0)
-        end = datetime(2025, 11, 30, 13, 0, 0)
+        start = datetime(2025, 11, 1, 0, 0, 0, tzinfo=timezone.utc)
+        end = datetime(2025, 11, 4, 0, 0, 0, tzinfo=timezone.utc)
 
         list(reader.query_range(start, end))
 
-        # Verify query was called with UTC formatted strings
-        call_args = mock_query_api.query_stream.call_args[0][0]
-        assert "2025-11-30T12:00:00Z" in call_args
-        assert "2025-11-30T13:00:00Z" in call_args
+        assert mock_query_api.query_csv.call_count == 1
 
-    def test_query_range_error(self, mocker):
-        """Test query_range raises QueryError on failure."""
-        mock_client = MagicMock()
-        mock_query_api = MagicMock()
-        mock_client.query_api.return_value = mock_query_api
-        mocker.patch.object(influx_reader, 'InfluxDBClient', return_value=mock_client)
+    def test_parallel_query_range_error(self, influx_reader_mocks):
+        """Test that a failing day query surfaces as QueryError."""
+        mock_client, mock_query_api, _ = influx_reader_mocks
 
-        mock_query_api.query_stream.side_effect = Exception("Query failed")
+        mock_query_api.query_csv.side_effect = Exception("Query failed")
 
-        reader = InfluxDBReader("http://localhost:8086", "token", "org", "bucket")
+        reader = InfluxDBReader("http://localhost:8086", "token", "org", "bucket", max_workers=2)
 
-        start = datetime(2025, 11, 30, 12, 0, 0, tzinfo=timezone.utc)
-        end = datetime(2025, 11, 30, 13, 0, 0, tzinfo=timezone.utc)
+        start = datetime(2025, 11, 1, 0, 0, 0, tzinfo=timezone.utc)
+        end = datetime(2025, 11, 3, 0, 0, 0, tzinfo=timezone.utc)
 
         with pytest.raises(QueryError) as exc_info:
             list(reader.query_range(start, end))
 
         assert "Failed to query range" in str(exc_info.value)
 
+    def test_split_by_day(self):
+        """Test that ranges are split on UTC day boundaries."""
+        start = datetime(2025, 11, 1, 18, 0, 0, tzinfo=timezone.utc)
+        end = datetime(2025, 11, 3, 6, 0, 0, tzinfo=timezone.utc)
+
+        windows = InfluxDBReader._split_by_day(start, end)
+
+        assert windows == [
+            (start, datetime(2025, 11, 2, 0, 0, 0, tzinfo=timezone.utc)),
+            (datetime(2025, 11, 2, 0, 0, 0, tzinfo=timezone.utc),
+             datetime(2025, 11, 3, 0, 0, 0, tzinfo=timezone.utc)),
+            (datetime(2025, 11, 3, 0, 0, 0, tzinfo=timezone.utc), end),
+        ]
+
 
 class TestInfluxDBReaderQueryDay:
     """Tests for query_day() method."""
 
-    def test_query_day(self, mocker):
+    def test_query_day(self, influx_reader_mocks):
         """Test query_day calls query_range with correct datetime range."""
-        mock_client = MagicMock()
-        mock_query_api = MagicMock()
-        mock_client.query_api.return_value = mock_query_api
-        mocker.patch.object(influx_reader, 'InfluxDBClient', return_value=mock_client)
-
-        mock_query_api.query_stream.return_value = []
+        mock_client, mock_query_api, reader = influx_reader_mocks
 
-        reader = InfluxDBReader("http://localhost:8086", "token", "org", "bucket")
+        mock_query_api.query_csv.return_value = []
 
         test_date = date(2025, 11, 30)
         list(reader.query_day(test_date))
 
         # Verify query was called with the full day range
-        call_args = mock_query_api.query_stream.call_args[0][0]
+        call_args = mock_query_api.query_csv.call_args[0][0]
         assert "2025-11-30T00:00:00Z" in call_args
         assert "2025-12-01T00:00:00Z" in call_args
 
 
-class TestInfluxDBReaderCountRecords:
-    """Tests for count_records() method."""
+class TestInfluxDBReaderEstimateCount:
+    """Tests for estimate_count() method."""
 
-    def test_count_records_no_range(self, mocker):
-        """Test count_records with no time range."""
-        mock_client = MagicMock()
-        mock_query_api = MagicMock()
-        mock_client.query_api.return_value = mock_query_api
-        mocker.patch.object(influx_reader, 'InfluxDBClient', return_value=mock_client)
+    def test_sums_per_series_counts_with_migration_filters(self, influx_reader_mocks):
+        """Test that counts use the migration filters and are summed server-side."""
+        mock_client, mock_query_api, _ = influx_reader_mocks
 
-        mock_record = MagicMock()
-        mock_record.get_value.return_value = 55070155
+        mock_query_api.query.return_value = [_flux_table({"_value": 1234})]
 
-        mock_table = MagicMock()
-        mock_table.records = [mock_record]
+        reader = InfluxDBReader("http://localhost:8086", "token", "org", "bucket", domains=["sensor"])
+        start = datetime(2025, 11, 30, 0, 0, 0, tzinfo=timezone.utc)
+        count = reader.estimate_count(start, start + timedelta(days=1))
 
-        mock_query_api.query.return_value = [mock_table]
+        assert count == 1234
+        call_args = mock_query_api.query.call_args[0][0]
+        assert 'r["domain"] == "sensor"' in call_args
+        assert call_args.index("count()") < call_args.index("group()") < call_args.index("sum()")
 
-        reader = InfluxDBReader("http://localhost:8086", "token", "org", "bucket")
-        count = reader.count_records()
+    def test_exclusion_keeps_count_pushdown_eligible(self, influx_reader_mocks):
+        """Test that excluded series are filtered with tag comparisons only before count()."""
+        mock_client, mock_query_api, _ = influx_reader_mocks
 
-        assert count == 55070155
-        call_args = mock_query_api.query.call_args[0][0]
-        assert "range(start: 0)" in call_args
+        mock_query_api.query.return_value = [_flux_table({"_value": 10})]
 
-    def test_count_records_with_start(self, mocker):
-        """Test count_records with start time only."""
-        mock_client = MagicMock()
-        mock_query_api = MagicMock()
-        mock_client.query_api.return_value = mock_query_api
-        mocker.patch.object(influx_reader, 'InfluxDBClient', return_value=mock_client)
+        reader = InfluxDBReader("http://localhost:8086", "token", "org", "bucket",
+                                exclude_series=[("sun", "units")])
+        start = datetime(2025, 11, 30, 0, 0, 0, tzinfo=timezone.utc)
+        reader.estimate_count(start, start + timedelta(days=1))
 
-        mock_record = MagicMock()
-        mock_record.get_value.return_value = 1000
+        call_args = mock_query_api.query.call_args[0][0]
+        assert 'r["domain"] != "sun"' in call_args
+        assert "contains(" not in call_args
+        assert "not (" not in call_args
+        assert call_args.index('r["domain"] != "sun"') < call_args.index("count()")
 
-        mock_table = MagicMock()
-        mock_table.records = [mock_record]
+    def test_estimate_count_error(self, influx_reader_mocks):
+        """Test estimate_count raises QueryError on failure."""
+        mock_client, mock_query_api, reader = influx_reader_mocks
 
-        mock_query_api.query.return_value = [mock_table]
+        mock_query_api.query.side_effect = Exception("timeout")
 
-        reader = InfluxDBReader("http://localhost:8086", "token", "org", "bucket")
         start = datetime(2025, 11, 30, 0, 0, 0, tzinfo=timezone.utc)
-        count = reader.count_records(start=start)
 
-        assert count == 1000
-        call_args = mock_query_api.query.call_args[0][0]
-        assert "2025-11-30T00:00:00Z" in call_args
+        with pytest.raises(QueryError, match="Failed to estimate record count"):
+            reader.estimate_count(start, start + timedelta(days=1))
+
+
+# Bounds shared by the count_records tests
+_COUNT_START = datetime(2025, 11, 30, 0, 0, 0, tzinfo=timezone.utc)
+_COUNT_END = datetime(2025, 11, 30, 12, 0, 0, tzinfo=timezone.utc)
 
-    def test_count_records_with_range(self, mocker):
-        """Test count_records with start and end times."""
-        mock_client = MagicMock()
-        mock_query_api = MagicMock()
-        mock_client.query_api.return_value = mock_query_api
-        mocker.patch.object(influx_reader, 'InfluxDBClient', return_value=mock_client)
 
-        mock_record = MagicMock()
-        mock_record.get_value.return_value = 500
+class TestInfluxDBReaderCountRecords:
+    """Tests for count_records() method."""
 
-        mock_table = MagicMock()
-        mock_table.records = [mock_record]
+    @pytest.mark.parametrize("kwargs,total,expected_in_query", [
+        ({}, 55070155, "range(start: 0)"),
+        ({"start": _COUNT_START}, 1000, "range(start: 2025-11-30T00:00:00Z)"),
+        ({"start": _COUNT_START, "end": _COUNT_END}, 500,
+         "range(start: 2025-11-30T00:00:00Z, stop: 2025-11-30T12:00:00Z)"),
+    ])
+    def test_count_records(self, influx_reader_mocks, kwargs, total, expected_in_query):
+        """Test count_records with no range, start only, and start and end."""
+        _, mock_query_api, reader = influx_reader_mocks
 
-        mock_query_api.query.return_value = [mock_table]
+        mock_query_api.query.return_value = [_flux_table({"_value": total})]
 
-        reader = InfluxDBReader("http://localhost:8086", "token", "org", "bucket")
-        start = datetime(2025, 11, 30, 0, 0, 0, tzinfo=timezone.utc)
-        end = datetime(2025, 11, 30, 12, 0, 0, tzinfo=timezone.utc)
-        count = reader.count_records(start=start, end=end)
+        assert reader.count_records(**kwargs) == total
+        assert expected_in_query in mock_query_api.query.call_args[0][0]
+
+    def test_count_records_is_cached(self, influx_reader_mocks):
+        """Test that repeated count_records calls for the same range query once."""
+        mock_client, mock_query_api, reader = influx_reader_mocks
 
-        assert count == 500
+        mock_query_api.query.return_value = [_flux_table({"_value": 500})]
 
-    def test_count_records_error(self, mocker):
+        assert reader.count_records(start=_COUNT_START, end=_COUNT_END) == 500
+        assert reader.count_records(start=_COUNT_START, end=_COUNT_END) == 500
+        assert mock_query_api.query.call_count == 1
+
+    def test_count_records_error(self, influx_reader_mocks):
         """Test count_records raises QueryError on failure."""
-        mock_client = MagicMock()
-        mock_query_api = MagicMock()
-        mock_client.query_api.return_value = mock_query_api
-        mocker.patch.object(influx_reader, 'InfluxDBClient', return_value=mock_client)
+        mock_client, mock_query_api, reader = influx_reader_mocks
 
         mock_query_api.query.side_effect = Exception("Query failed")
 
-        reader = InfluxDBReader("http://localhost:8086", "token", "org", "bucket")
-
         with pytest.raises(QueryError) as exc_info:
             reader.count_records()
 
@@ -424,14 +560,10 @@ class TestInfluxDBReaderCountRecords:
 class TestInfluxDBReaderClose:
     """Tests for close() method."""
 
-    def test_close(self, mocker):
+    def test_close(self, influx_reader_mocks):
         """Test that close() closes the client."""
-        mock_client = MagicMock()
-        mock_query_api = MagicMock()
-        mock_client.query_api.return_value = mock_query_api
-        mocker.patch.object(influx_reader, 'InfluxDBClient', return_value=mock_client)
+        mock_client, mock_query_api, reader = influx_reader_mocks
 
-        reader = InfluxDBReader("http://localhost:8086", "token", "org", "bucket")
         reader.close()
 
         mock_client.close.assert_called_once()
@@ -6,14 +6,13 @@ including schema loading, metric name generation, label building, and validation
 """
 
 import pytest
-import sys
-from pathlib import Path
-
-# Add parent directory to path so we can import modules
-sys.path.insert(0, str(Path(__file__).parent.parent))
+from unittest.mock import MagicMock
 
 import mapping
 
+# The real implementation; the autouse conftest fixture patches the module attribute
+_fetch_vm_metrics = mapping.fetch_vm_metrics
+
 
 class TestSchemaLoading:
     """Tests for YAML schema loading functionality."""
@@ -30,10 +29,30 @@ class TestSchemaLoading:
             mapping.load_schema("/nonexistent/path/to/schema.yaml")
         assert "not found" in str(exc_info.value).lower()
 
-    def test_known_metrics_is_set(self):
-        """Test that KNOWN_VM_METRICS is loaded as a set."""
+    def test_special_rules_precompiled(self):
+        """Test that special mapping rules are flattened at load time."""
+        mapping.load_schema()
+        rules, default = mapping._SPECIAL_RULES["%"]
+
+        assert ("battery", "homeassistant_sensor_battery_percent") in rules
+        assert ("signal", mapping.IGNORE_METRIC) in rules
+        assert all(pattern != "default" for pattern, _ in rules)
+        assert default == "homeassistant_sensor_unit_percent"
+
+    @pytest.mark.usefixtures("fresh_schema")
+    def test_mapping_lookup_does_not_fetch_known_metrics(self):
+        """Test that plain mapping lookups never contact VictoriaMetrics."""
+        mapping.is_ignored("sensor", "°C")
+        mapping.get_vm_metric_name("sensor", "°C", "temp_room")
+        assert mapping.fetch_vm_metrics.call_count == 0
+
+        mapping.validate_metric_name("homeassistant_sensor_temperature_celsius")
+        assert mapping.fetch_vm_metrics.call_count == 1
+
+    def test_known_metrics_is_frozenset(self):
+        """Test that KNOWN_VM_METRICS is loaded as a frozenset."""
         known_metrics = mapping._get_known_metrics()
-        assert isinstance(known_metrics, set)
+        assert isinstance(known_metrics, frozenset)
 
     def test_known_metrics_count(self):
         """Test that KNOWN_VM_METRICS contains a reasonable number of metrics."""
@@ -56,50 +75,93 @@ class TestSchemaLoading:
 class TestGetVMMetricName:
     """Tests for get_vm_metric_name() function."""
 
-    def test_temperature_sensor(self):
-        """Test temperature sensor mapping (°C)."""
-        result = mapping.get_vm_metric_name("sensor", "°C", "temperature_living_room")
-        assert result == "homeassistant_sensor_temperature_celsius"
+    @pytest.mark.parametrize("domain,measurement,entity_id,expected", [
+        ("sensor", "°C", "temperature_living_room", "homeassistant_sensor_temperature_celsius"),
+        ("sensor", "W", "power_consumption", "homeassistant_sensor_power_w"),
+        ("sensor", "kWh", "total_energy", "homeassistant_sensor_energy_kwh"),
+        ("binary_sensor", "units", "motion_detected", "homeassistant_binary_sensor_state"),
+        ("switch", "units", "living_room_light", "homeassistant_switch_state"),
+        ("sensor", "dBm", "wifi_signal", "homeassistant_sensor_signal_strength_dbm"),
+        ("sensor", "km", "distance_traveled", "homeassistant_sensor_distance_km"),
+        # Unknown unit and unknown domain fall back to the state metric
+        ("sensor", "unknown_unit", "test_sensor", "homeassistant_sensor_state"),
+        ("unknown_domain", "units", "test_entity", "homeassistant_unknown_domain_state"),
+    ])
+    def test_metric_name(self, domain, measurement, entity_id, expected):
+        """Test mapping of domain and unit to a VictoriaMetrics metric name."""
+        assert mapping.get_vm_metric_name(domain, measurement, entity_id) == expected
+
+
+class TestFetchVMMetrics:
+    """Tests for fetch_vm_metrics()."""
+
+    def test_fetch_sends_one_request_for_all_prefixes(self):
+        """Test that every prefix becomes a match[] selector on a single request."""
+        session = MagicMock()
+        session.get.return_value.json.return_value = {
+            "status": "success",
+            "data": ["homeassistant_sensor_state", "node_cpu_seconds_total"]
+        }
+
+        metrics = _fetch_vm_metrics("http://vm:8428", prefixes=("homeassistant_", "node_"),
+                                    session=session)
+
+        assert metrics == {"homeassistant_sensor_state", "node_cpu_seconds_total"}
+        assert isinstance(metrics, frozenset)
+        session.get.assert_called_once()
+        call_args = session.get.call_args
+        assert call_args[0][0] == "http://vm:8428/api/v1/label/__name__/values"
+        assert call_args[1]['params'] == [
+            ("match[]", "{__name__=~'homeassistant_.*'}"),
+            ("match[]", "{__name__=~'node_.*'}"),
+        ]
+
+    def test_fetch_error_status_raises_connection_error(self):
+        """Test that a non-success API status raises ConnectionError."""
+        session = MagicMock()
+        session.get.return_value.json.return_value = {"status": "error", "error": "bad match"}
+
+        with pytest.raises(ConnectionError) as exc_info:
+            _fetch_vm_metrics("http://vm:8428", session=session)
+
+        assert "bad match" in str(exc_info.value)
+
 
-    def test_power_sensor(self):
-        """Test power sensor mapping (W)."""
-        result = mapping.get_vm_metric_name("sensor", "W", "power_consumption")
-        assert result == "homeassistant_sensor_power_w"
+class TestIgnoredSeries:
+    """Tests for ignored_series() function."""
 
-    def test_energy_sensor(self):
-        """Test energy sensor mapping (kWh)."""
-        result = mapping.get_vm_metric_name("sensor", "kWh", "total_energy")
-        assert result == "homeassistant_sensor_energy_kwh"
+    def test_lists_ignored_measurements(self):
+        """Test that ignored metric mappings are listed and mapped ones are not."""
+        series = mapping.ignored_series()
 
-    def test_binary_sensor(self):
-        """Test binary sensor mapping."""
-        result = mapping.get_vm_metric_name("binary_sensor", "units", "motion_detected")
-        assert result == "homeassistant_binary_sensor_state"
+        assert ("sun", "units") in series
+        assert ("sensor", "°C") not in series
+        for domain, measurement in series:
+            assert mapping.get_vm_metric_name(domain, measurement, "any_entity") is None
 
-    def test_switch(self):
-        """Test switch state mapping."""
-        result = mapping.get_vm_metric_name("switch", "units", "living_room_light")
-        assert result == "homeassistant_switch_state"
 
-    def test_signal_strength(self):
-        """Test signal strength mapping (dBm)."""
-        result = mapping.get_vm_metric_name("sensor", "dBm", "wifi_signal")
-        assert result == "homeassistant_sensor_signal_strength_dbm"
+@pytest.mark.usefixtures("fresh_schema")
+class TestMappingCache:
+    """Tests for memoized mapping lookups."""
 
-    def test_distance(self):
-        """Test distance mapping (km)."""
-        result = mapping.get_vm_metric_name("sensor", "km", "distance_traveled")
-        assert result == "homeassistant_sensor_distance_km"
+    def test_repeated_lookup_is_cached(self):
+        """Test that repeated lookups for the same combination hit the cache."""
+        mapping.load_schema()
+        mapping.get_vm_metric_name("sensor", "°C", "temperature_living_room")
+        mapping.get_vm_metric_name("sensor", "°C", "temperature_living_room", field="value")
 
-    def test_unknown_unit_fallback(self):
-        """Test fallback for unknown unit."""
-        result = mapping.get_vm_metric_name("sensor", "unknown_unit", "test_sensor")
-        assert result == "homeassistant_sensor_state"
+        info = mapping._resolve_vm_metric_name.cache_info()
+        assert info.misses == 1
+        assert info.hits == 1
 
-    def test_unknown_domain_fallback(self):
-        """Test fallback for unknown domain."""
-        result = mapping.get_vm_metric_name("unknown_domain", "units", "test_entity")
-        assert result == "homeassistant_unknown_domain_state"
+    def test_load_schema_clears_cache(self):
+        """Test that loading a schema invalidates memoized lookups."""
+        mapping.get_vm_metric_name("sensor", "°C", "temperature_living_room")
+        assert mapping._resolve_vm_metric_name.cache_info().currsize == 1
+
+        mapping.load_schema()
+
+        assert mapping._resolve_vm_metric_name.cache_info().currsize == 0
 
 
 class TestSpecialPercentHandling:
@@ -142,6 +204,11 @@ class TestSpecialPercentHandling:
         result = mapping.get_vm_metric_name("sensor", "%", entity_id)
         assert result == expected
 
+    def test_earlier_rule_wins_over_earlier_position(self):
+        """Test that rule order, not match position, decides overlapping patterns."""
+        result = mapping.get_vm_metric_name("sensor", "%", "Humidity_Sensor_Battery")
+        assert result == "homeassistant_sensor_battery_percent"
+
 
 class TestBuildVMLabels:
     """Tests for build_vm_labels() function."""
@@ -175,6 +242,17 @@ class TestBuildVMLabels:
         result = mapping.build_vm_labels("switch", "living_light", "Living Room Light")
         assert result.get('entity') == "switch.living_light"
 
+    def test_missing_friendly_name_falls_back_to_entity_id(self):
+        """Test that an empty friendly_name is replaced by the entity_id."""
+        assert mapping.build_vm_labels("sensor", "test_sensor", "")['friendly_name'] == "test_sensor"
+        assert mapping.build_vm_labels("sensor", "test_sensor", None)['friendly_name'] == "test_sensor"
+
+    def test_labels_are_cached_per_entity(self):
+        """Test that repeated calls for one entity return the same labels dict."""
+        first = mapping.build_vm_labels("sensor", "temp_room", "Room Temp")
+        second = mapping.build_vm_labels("sensor", "temp_room", "Room Temp")
+        assert first is second
+
     def test_all_required_labels_present(self):
         """Test that all required labels are present."""
         result = mapping.build_vm_labels("sensor", "test", "Test Sensor")
@@ -185,44 +263,28 @@ class TestBuildVMLabels:
 class TestValidateMetricName:
     """Tests for validate_metric_name() function."""
 
-    def test_validate_known_temperature_metric(self):
-        """Test validation of known temperature metric."""
-        result = mapping.validate_metric_name("homeassistant_sensor_temperature_celsius")
-        assert result is True
-
-    def test_validate_known_binary_sensor_metric(self):
-        """Test validation of known binary sensor metric."""
-        result = mapping.validate_metric_name("homeassistant_binary_sensor_state")
-        assert result is True
-
-    def test_validate_unknown_metric(self):
-        """Test validation of unknown metric returns False."""
-        result = mapping.validate_metric_name("homeassistant_sensor_unknown_metric")
-        assert result is False
-
-    def test_validate_invalid_metric_name(self):
-        """Test validation of completely invalid metric name."""
-        result = mapping.validate_metric_name("not_a_homeassistant_metric")
-        assert result is False
+    @pytest.mark.parametrize("metric_name,expected", [
+        ("homeassistant_sensor_temperature_celsius", True),
+        ("homeassistant_binary_sensor_state", True),
+        ("homeassistant_sensor_unknown_metric", False),
+        ("not_a_homeassistant_metric", False),
+    ])
+    def test_validate_metric_name(self, metric_name, expected):
+        """Test that only metrics known to VictoriaMetrics validate."""
+        assert mapping.validate_metric_name(metric_name) is expected
 
 
 class TestGetVMMetricNameStrict:
     """Tests for get_vm_metric_name_strict() function."""
 
-    def test_strict_validation_temperature_sensor(self):
-        """Test strict validation with known temperature metric."""
-        result = mapping.get_vm_metric_name_strict("sensor", "°C", "temp_room")
-        assert result == "homeassistant_sensor_temperature_celsius"
-
-    def test_strict_validation_binary_sensor(self):
-        """Test strict validation with known binary sensor metric."""
-        result = mapping.get_vm_metric_name_strict("binary_sensor", "units", "motion")
-        assert result == "homeassistant_binary_sensor_state"
-
-    def test_strict_validation_power_sensor(self):
-        """Test strict validation with known power metric."""
-        result = mapping.get_vm_metric_name_strict("sensor", "W", "power_usage")
-        assert result == "homeassistant_sensor_power_w"
+    @pytest.mark.parametrize("domain,measurement,entity_id,expected", [
+        ("sensor", "°C", "temp_room", "homeassistant_sensor_temperature_celsius"),
+        ("binary_sensor", "units", "motion", "homeassistant_binary_sensor_state"),
+        ("sensor", "W", "power_usage", "homeassistant_sensor_power_w"),
+    ])
+    def test_strict_validation_known_metric(self, domain, measurement, entity_id, expected):
+        """Test strict validation returns known metric names."""
+        assert mapping.get_vm_metric_name_strict(domain, measurement, entity_id) == expected
 
     def test_strict_validation_raises_for_unknown_metric(self):
         """Test that strict validation raises ValueError for unknown metric."""
@@ -281,6 +343,17 @@ class TestDryRunValidate:
         assert success_count == 0
         assert len(errors) == 3
 
+    def test_dry_run_duplicate_records_resolved_once(self, mocker):
+        """Test that duplicate records are resolved once but counted individually."""
+        spy = mocker.spy(mapping, "get_vm_metric_name_strict")
+        records = [("sensor", "°C", "temp_room")] * 5 + [("fake_domain_xyz", "units", "entity")] * 2
+
+        success_count, errors = mapping.dry_run_validate(records)
+
+        assert success_count == 5
+        assert len(errors) == 2
+        assert spy.call_count == 2
+
     def test_dry_run_empty_list(self):
         """Test dry run validation with empty list."""
         empty_records = []
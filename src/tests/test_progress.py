@@ -4,13 +4,16 @@ Tests for Progress Tracking Module
 Tests the progress.py module including MigrationProgress dataclass and ProgressTracker.
 """
 
+import errno
 import json
+import logging
 import pytest
 import tempfile
 import shutil
 from datetime import datetime, date
 from pathlib import Path
 
+import progress
 from progress import MigrationProgress, ProgressTracker
 
 
@@ -61,6 +64,20 @@ class TestMigrationProgress:
         assert data['records_migrated'] == 0
         assert data['dry_run'] is False
 
+    def test_to_dict_matches_asdict(self, sample_progress):
+        """Test that the shallow to_dict has the same keys, order and values as asdict."""
+        from dataclasses import asdict
+
+        sample_progress.completed_dates.append("2025-06-01")
+        data = sample_progress.to_dict()
+
+        assert list(data) == list(asdict(sample_progress))
+        assert data == asdict(sample_progress)
+
+    def test_uses_slots(self, sample_progress):
+        """Test that MigrationProgress instances carry no per-instance __dict__."""
+        assert not hasattr(sample_progress, "__dict__")
+
     def test_from_dict(self):
         """Test creating MigrationProgress from dictionary."""
         data = {
@@ -155,6 +172,96 @@ class TestProgressTracker:
         # Verify actual file exists
         assert tracker.progress_file.exists()
 
+    def test_unchanged_save_is_skipped(self, tracker, sample_progress, mocker):
+        """Test that saving an unchanged state does not rewrite the file."""
+        tracker.save(sample_progress)
+        saved_at = sample_progress.last_updated
+        replace = mocker.spy(Path, 'replace')
+
+        tracker.save(sample_progress)
+        assert replace.call_count == 0
+        assert sample_progress.last_updated == saved_at
+
+        sample_progress.records_migrated += 1
+        tracker.save(sample_progress)
+        assert replace.call_count == 1
+
+    def test_save_fsyncs_file_and_directory(self, tracker, sample_progress, mocker):
+        """Test that save fsyncs the temp file and the state directory."""
+        fsync = mocker.spy(progress.os, 'fsync')
+
+        tracker.save(sample_progress)
+
+        assert fsync.call_count == 2
+
+    def test_save_uses_full_fsync_where_available(self, tracker, sample_progress, mocker):
+        """Test that the file is flushed with F_FULLFSYNC when fcntl provides it (macOS)."""
+        fake_fcntl = mocker.MagicMock(F_FULLFSYNC=51)
+        mocker.patch.object(progress, 'fcntl', fake_fcntl)
+        fsync = mocker.spy(progress.os, 'fsync')
+
+        tracker.save(sample_progress)
+
+        assert fake_fcntl.fcntl.call_args[0][1] == 51
+        # Only the directory still goes through fsync
+        assert fsync.call_count == 1
+
+    def test_save_falls_back_to_fsync_when_full_fsync_fails(self, tracker, sample_progress, mocker):
+        """Test that fsync is used when the filesystem rejects F_FULLFSYNC."""
+        fake_fcntl = mocker.MagicMock(F_FULLFSYNC=51)
+        fake_fcntl.fcntl.side_effect = OSError(errno.ENOTSUP, "not supported")
+        mocker.patch.object(progress, 'fcntl', fake_fcntl)
+        fsync = mocker.spy(progress.os, 'fsync')
+
+        tracker.save(sample_progress)
+
+        assert fsync.call_count == 2
+        assert tracker.load() is not None
+
+    def test_save_falls_back_when_unnamed_temp_unsupported(self, tracker, sample_progress, mocker):
+        """Test that save uses a named temp file when O_TMPFILE is rejected."""
+        real_open = progress.os.open
+
+        o_tmpfile = getattr(progress.os, 'O_TMPFILE', -1)
+
+        def reject_tmpfile(path, flags, *args, **kwargs):
+            # O_TMPFILE includes the O_DIRECTORY bit, so match all of its bits
+            if flags & o_tmpfile == o_tmpfile:
+                raise OSError(errno.EOPNOTSUPP, "Operation not supported")
+            return real_open(path, flags, *args, **kwargs)
+
+        mocker.patch.object(progress.os, 'open', side_effect=reject_tmpfile)
+
+        tracker.save(sample_progress)
+        tracker.save(sample_progress)
+
+        assert tracker._use_unnamed_temp is False
+        assert tracker.load().status == sample_progress.status
+        assert not tracker.progress_file.with_suffix('.tmp').exists()
+
+    def test_save_writes_compact_json_unless_debugging(self, tracker, sample_progress, caplog):
+        """Test that the state file is compact, and indented when debug logging is on."""
+        tracker.save(sample_progress)
+        with open(tracker.progress_file, 'rb') as f:
+            assert b'\n' not in f.read()
+
+        caplog.set_level(logging.DEBUG, logger="progress")
+        sample_progress.records_migrated += 1
+        tracker.save(sample_progress)
+        with open(tracker.progress_file, 'rb') as f:
+            assert f.read().startswith(b'{\n  "started_at"')
+
+    def test_save_without_orjson_matches(self, tracker, sample_progress, monkeypatch):
+        """Test that the stdlib json fallback writes the same file and loads it back."""
+        sample_progress.errors.append("Failed on 2025-06-01: café")
+        tracker.save(sample_progress)
+        with open(tracker.progress_file, 'rb') as f:
+            saved = f.read()
+
+        monkeypatch.setattr(progress, 'orjson', None)
+        assert progress._dump_json(sample_progress.to_dict()) == saved
+        assert tracker.load().errors == ["Failed on 2025-06-01: café"]
+
     def test_load_corrupted_file_returns_none(self, tracker, temp_state_dir):
         """Test that loading a corrupted JSON file returns None."""
         # Create corrupted JSON file
@@ -164,6 +271,16 @@ class TestProgressTracker:
         progress = tracker.load()
         assert progress is None
 
+    @pytest.mark.parametrize("use_orjson", [True, False])
+    def test_load_non_utf8_file_returns_none(self, tracker, monkeypatch, use_orjson):
+        """Test that a state file that is not valid UTF-8 is treated as corrupted."""
+        if not use_orjson:
+            monkeypatch.setattr(progress, 'orjson', None)
+        with open(tracker.progress_file, 'wb') as f:
+            f.write(b'\xff\xfe{')
+
+        assert tracker.load() is None
+
     def test_create_new(self, tracker):
         """Test creating new progress."""
         oldest = datetime(2025, 5, 1, 0, 0, 0)
@@ -224,6 +341,80 @@ class TestProgressTracker:
         assert sample_progress.records_migrated == 45000
         assert sample_progress.batches_sent == 5
 
+    def test_update_out_of_order_tracks_completed_dates(self, tracker, sample_progress):
+        """Test that days completing out of order are all recorded."""
+        tracker.update(sample_progress, date(2025, 6, 3), records=10, batches=1)
+        tracker.update(sample_progress, date(2025, 6, 1), records=10, batches=1)
+
+        assert sample_progress.last_migrated_date == "2025-06-03"
+        loaded = tracker.load()
+        assert loaded.completed_dates == ["2025-06-03", "2025-06-01"]
+
+    def test_update_defers_save_until_flush_limit(self, temp_state_dir, sample_progress):
+        """Test that update only saves once flush_every days are unsaved."""
+        tracker = ProgressTracker(temp_state_dir, flush_interval=3600, flush_every=3)
+        tracker.save(sample_progress)
+
+        tracker.update(sample_progress, date(2025, 6, 1), records=10, batches=1)
+        tracker.update(sample_progress, date(2025, 6, 2), records=10, batches=1)
+        with open(tracker.progress_file, 'rb') as f:
+            assert json.loads(f.read())['records_migrated'] == 0
+
+        tracker.update(sample_progress, date(2025, 6, 3), records=10, batches=1)
+        with open(tracker.progress_file, 'rb') as f:
+            assert json.loads(f.read())['records_migrated'] == 30
+        assert not tracker.checkpoints_file.exists()
+
+    def test_load_replays_checkpointed_days(self, temp_state_dir, sample_progress):
+        """Test that days not yet saved are recovered from the checkpoint log."""
+        tracker = ProgressTracker(temp_state_dir, flush_interval=3600, flush_every=5)
+        tracker.save(sample_progress)
+        tracker.update(sample_progress, date(2025, 6, 1), records=10, batches=1)
+        tracker.update(sample_progress, date(2025, 6, 2), records=20, batches=2)
+
+        loaded = ProgressTracker(temp_state_dir).load()
+
+        assert loaded.completed_dates == ["2025-06-01", "2025-06-02"]
+        assert loaded.records_migrated == 30
+        assert loaded.batches_sent == 3
+        assert loaded.last_migrated_date == "2025-06-02"
+        assert loaded.status == "in_progress"
+
+    def test_load_skips_saved_and_torn_checkpoints(self, temp_state_dir, sample_progress):
+        """Test that replay ignores days already saved and an incomplete last line."""
+        tracker = ProgressTracker(temp_state_dir, flush_interval=3600, flush_every=5)
+        tracker.update(sample_progress, date(2025, 6, 1), records=10, batches=1)
+        # A crash after saving but before the log was removed, then mid-append
+        tracker.save(sample_progress)
+        with open(tracker.checkpoints_file, 'wb') as f:
+            f.write(b'{"date":"2025-06-01","records":10,"batches":1}\n{"date":"2025-06-0')
+
+        loaded = tracker.load()
+
+        assert loaded.records_migrated == 10
+        assert loaded.completed_dates == ["2025-06-01"]
+
+    def test_flush_saves_unsaved_days(self, temp_state_dir, sample_progress):
+        """Test that flush writes days update() kept in memory."""
+        tracker = ProgressTracker(temp_state_dir, flush_interval=3600, flush_every=5)
+        tracker.save(sample_progress)
+        tracker.update(sample_progress, date(2025, 6, 1), records=10, batches=1)
+
+        tracker.flush(sample_progress)
+
+        assert tracker.load().completed_dates == ["2025-06-01"]
+
+    def test_load_state_without_completed_dates(self, tracker, sample_progress):
+        """Test that state files written before completed_dates still load."""
+        data = sample_progress.to_dict()
+        del data['completed_dates']
+        with open(tracker.progress_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+
+        loaded = tracker.load()
+        assert loaded is not None
+        assert loaded.completed_dates == []
+
     def test_mark_completed(self, tracker, sample_progress):
         """Test marking migration as completed."""
         sample_progress.status = "in_progress"
@@ -252,6 +443,35 @@ class TestProgressTracker:
         assert loaded.status == "failed"
         assert error_msg in loaded.errors
 
+    def test_mark_failed_keeps_most_recent_errors(self, tracker, sample_progress):
+        """Test that only the last MAX_STORED_ERRORS errors are kept."""
+        sample_progress.errors.extend(f"error {i}" for i in range(progress.MAX_STORED_ERRORS))
+
+        tracker.mark_failed(sample_progress, "latest")
+
+        assert len(sample_progress.errors) == progress.MAX_STORED_ERRORS
+        assert sample_progress.errors[0] == "error 1"
+        assert sample_progress.errors[-1] == "latest"
+
+    def test_mark_failed_appends_full_history_to_errors_log(self, tracker, sample_progress):
+        """Test that the errors log keeps errors trimmed from the state file."""
+        for i in range(progress.MAX_STORED_ERRORS + 5):
+            tracker.mark_failed(sample_progress, f"error {i}")
+
+        history = list(tracker.read_errors())
+        assert len(history) == progress.MAX_STORED_ERRORS + 5
+        assert history[0] == "error 0"
+        assert tracker.load().errors == history[-progress.MAX_STORED_ERRORS:]
+
+    def test_reset_with_backup_keeps_errors_log(self, tracker, sample_progress):
+        """Test that reset moves the errors log aside along with the state file."""
+        tracker.mark_failed(sample_progress, "boom")
+
+        tracker.reset(backup=True)
+
+        assert list(tracker.read_errors()) == []
+        assert len(list(tracker.state_dir.glob("progress_*.errors.log"))) == 1
+
     def test_reset_without_backup(self, tracker, sample_progress):
         """Test reset without backup removes file."""
         # Save a progress file
@@ -286,6 +506,16 @@ class TestProgressTracker:
             data = json.load(f)
         assert data['status'] == sample_progress.status
 
+    def test_reset_backup_falls_back_to_copy(self, tracker, sample_progress, mocker):
+        """Test that the backup is copied when hard links are not supported."""
+        tracker.save(sample_progress)
+        mocker.patch.object(progress.os, 'link', side_effect=OSError(errno.EPERM, "Operation not permitted"))
+
+        tracker.reset(backup=True)
+
+        assert not tracker.progress_file.exists()
+        assert len(list(tracker.state_dir.glob("progress_*.backup.json"))) == 1
+
     def test_reset_nonexistent_file_no_error(self, tracker):
         """Test that resetting when no file exists doesn't error."""
         # Should not raise exception
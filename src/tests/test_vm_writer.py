@@ -5,15 +5,11 @@ This module tests the VictoriaMetrics writer functionality with mocked HTTP requ
 ensuring proper data formatting, batch writing, error handling, and dry-run mode.
 """
 
+import gzip
 import pytest
 from unittest.mock import Mock, MagicMock, patch
-import sys
-from pathlib import Path
 
-# Add parent directory to path so we can import modules
-sys.path.insert(0, str(Path(__file__).parent.parent))
-
-from vm_writer import VMWriter, VMDataPoint, WriteError
+from vm_writer import VMWriter, VMDataPoint, VMBatch, WriteError
 
 
 class TestVMDataPoint:
@@ -38,6 +34,70 @@ class TestVMDataPoint:
         point2 = VMDataPoint("test_metric", {"label": "value"}, 10.0, 1000000)
         assert point1 == point2
 
+    def test_dataclass_uses_slots(self):
+        """Test that VMDataPoint instances carry no per-instance __dict__."""
+        point = VMDataPoint("test_metric", {"label": "value"}, 10.0, 1000000)
+        assert not hasattr(point, "__dict__")
+
+
+class TestVMBatch:
+    """Tests for the VMBatch columnar buffer."""
+
+    def test_append_and_len(self):
+        """Test that appended samples land in the parallel columns."""
+        batch = VMBatch()
+        labels = {"entity": "sensor.temp"}
+        batch.append("metric1", labels, 21.5, 1000000)
+        batch.append("metric2", labels, 65.0, 2000000)
+
+        assert len(batch) == 2
+        assert batch.metric_names == ["metric1", "metric2"]
+        assert batch.labels[0] is labels
+        assert list(batch.values) == [21.5, 65.0]
+        assert list(batch.timestamps_ms) == [1000000, 2000000]
+
+    def test_write_batch_matches_point_list(self):
+        """Test that a VMBatch serializes exactly like the equivalent point list."""
+        writer = VMWriter("http://localhost:8428", dry_run=True)
+        points = [
+            VMDataPoint("metric1", {"entity": "sensor.temp", "domain": "sensor"}, 21.5, 1000000),
+            VMDataPoint("metric2", {}, -3.0, 2000000),
+        ]
+        batch = VMBatch.from_points(points)
+
+        expected = "".join(writer.format_prometheus_line(point) + "\n" for point in points)
+        assert writer._encode_batch(batch).decode("utf-8") == expected
+        assert writer.write_batch(batch) == 2
+
+    def test_encode_batch_sorts_by_series_then_time(self):
+        """Test that encoded lines are grouped per series in timestamp order."""
+        writer = VMWriter("http://localhost:8428", dry_run=True)
+        batch = VMBatch()
+        batch.append("metric_b", {}, 1.0, 2000)
+        batch.append("metric_a", {}, 2.0, 3000)
+        batch.append("metric_b", {}, 3.0, 1000)
+        batch.append("metric_a", {}, 4.0, 1000)
+
+        lines = writer._encode_batch(batch).decode("utf-8").splitlines()
+
+        assert lines == [
+            "metric_a 4.0 1000",
+            "metric_a 2.0 3000",
+            "metric_b 3.0 1000",
+            "metric_b 1.0 2000",
+        ]
+
+    def test_series_prefix_cached_per_label_dict(self):
+        """Test that the encoded series prefix is reused for a shared label dict."""
+        writer = VMWriter("http://localhost:8428", dry_run=True)
+        labels = {"entity": "sensor.temp"}
+
+        first = writer._series_prefix("metric1", labels)
+        second = writer._series_prefix("metric1", labels)
+
+        assert first == b'metric1{entity="sensor.temp"} '
+        assert second is first
+
 
 class TestVMWriterInit:
     """Tests for VMWriter initialization."""
@@ -65,6 +125,29 @@ class TestVMWriterInit:
         assert writer._url == "http://localhost:8428"
         assert writer._import_url == "http://localhost:8428/api/v1/import/prometheus"
 
+    def test_init_sizes_connection_pool(self):
+        """Test that the keep-alive pool holds one connection per concurrent writer."""
+        writer = VMWriter("http://localhost:8428", dry_run=True, max_connections=4)
+        adapter = writer._session.get_adapter("http://localhost:8428")
+        assert adapter._pool_maxsize == 4
+
+    def test_init_retries_with_capped_jittered_backoff(self):
+        """Test that import retries back off briefly, with jitter, and include 429."""
+        writer = VMWriter("http://localhost:8428", dry_run=True)
+        retry = writer._session.get_adapter("http://localhost:8428").max_retries
+        assert retry.total == 3
+        assert retry.backoff_max == 2.0
+        assert retry.backoff_jitter > 0
+        assert 429 in retry.status_forcelist
+
+    def test_health_check_session_does_not_retry(self):
+        """Test that health checks use a separate session without the import retries."""
+        writer = VMWriter("http://localhost:8428", dry_run=True)
+        health_adapter = writer._health_session.get_adapter("http://localhost:8428")
+        import_adapter = writer._session.get_adapter("http://localhost:8428")
+        assert health_adapter is not import_adapter
+        assert health_adapter.max_retries.total == 0
+
 
 class TestFormatPrometheusLine:
     """Tests for format_prometheus_line() method."""
@@ -335,6 +418,55 @@ class TestWriteBatchRealMode:
         assert 'metric2{entity="sensor.humidity"} 65.0 2000000' in payload
         assert '\n' in payload
 
+    @patch('vm_writer.requests.Session')
+    def test_write_batch_gzip(self, mock_session_class):
+        """Test that compress=True sends a gzip body with Content-Encoding set."""
+        mock_session = MagicMock()
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_session.post.return_value = mock_response
+        mock_session_class.return_value = mock_session
+
+        writer = VMWriter("http://localhost:8428", dry_run=False, compress=True)
+        writer.write_batch([VMDataPoint("metric1", {"entity": "sensor.temp"}, 21.5, 1000000)])
+
+        call_args = mock_session.post.call_args
+        assert call_args[1]['headers']['Content-Encoding'] == 'gzip'
+        payload = gzip.decompress(call_args[1]['data']).decode('utf-8')
+        assert payload == 'metric1{entity="sensor.temp"} 21.5 1000000\n'
+
+
+class TestBatchLimit:
+    """Tests for batch_limit() autotuning."""
+
+    def test_limit_is_max_before_first_batch(self):
+        """Test that the configured maximum applies until a batch was observed."""
+        writer = VMWriter("http://localhost:8428", dry_run=True, target_batch_bytes=1000)
+        assert writer.batch_limit(5000) == 5000
+
+    def test_limit_follows_observed_bytes_per_point(self):
+        """Test that batches shrink so the body stays near the byte target."""
+        writer = VMWriter("http://localhost:8428", dry_run=True, target_batch_bytes=1000)
+        batch = VMBatch()
+        for i in range(10):
+            batch.append("metric1", {"entity": "sensor.temp"}, 21.5, 1000000 + i)
+        writer.write_batch(batch)
+
+        line_bytes = len(writer._encode_batch(batch)) / len(batch)
+        assert writer.batch_limit(5000) == int(1000 / line_bytes)
+        assert writer.batch_limit(3) == 3
+
+    def test_limit_without_byte_target(self):
+        """Test that only the point count applies when no byte target is set."""
+        writer = VMWriter("http://localhost:8428", dry_run=True, target_batch_bytes=None)
+        writer.write_batch([VMDataPoint("metric1", {}, 1.0, 1000000)])
+        assert writer.batch_limit(5000) == 5000
+
+    def test_limit_defaults_to_batch_size(self):
+        """Test that the writer's batch_size caps batches when no maximum is given."""
+        writer = VMWriter("http://localhost:8428", dry_run=True, batch_size=250)
+        assert writer.batch_limit() == 250
+
 
 class TestHealthCheck:
     """Tests for health_check() method."""
@@ -428,14 +560,16 @@ class TestVMWriterProperties:
 
     @patch('vm_writer.requests.Session')
     def test_close(self, mock_session_class):
-        """Test close() method."""
+        """Test that close() closes the import and health check sessions."""
         mock_session = MagicMock()
-        mock_session_class.return_value = mock_session
+        mock_health_session = MagicMock()
+        mock_session_class.side_effect = [mock_session, mock_health_session]
 
         writer = VMWriter("http://localhost:8428", dry_run=True)
         writer.close()
 
         mock_session.close.assert_called_once()
+        mock_health_session.close.assert_called_once()
 
 
 class TestWriteError:
@@ -5,21 +5,50 @@ Handles writing time-series data to VictoriaMetrics using the Prometheus import
 Supports batch writing, retry logic, and dry-run mode for validation.
 """
 
+import gzip
 import logging
+import threading
 import time
+from array import array
 from dataclasses import dataclass
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple, Union
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
+# Upper bound on cached encoded series prefixes; the cache is reset when full
+_MAX_CACHED_SERIES = 65536
+
+# Request body size batches are tuned towards; past about 1 MiB ingest
+# latency grows while throughput no longer improves
+DEFAULT_TARGET_BATCH_BYTES = 1024 * 1024
+
+# Weight of the latest batch in the running bytes-per-point average
+_BYTES_PER_POINT_SMOOTHING = 0.2
+
+# gzip level for request bodies; level 1 is several times faster than the
+# default and repetitive label text still compresses about as well
+_GZIP_LEVEL = 1
+
+# Retry backoff for failed requests in seconds: exponential from the factor,
+# capped at the max, plus up to the jitter at random
+_RETRY_BACKOFF_FACTOR = 0.5
+_RETRY_BACKOFF_MAX = 2.0
+_RETRY_BACKOFF_JITTER = 0.5
+
+
+def _escape_label_value(value: str) -> str:
+    """Escape backslashes, quotes and newlines in a label value."""
+    value = str(value)  # Ensure string type
+    # Most values need no escaping; plain 'in' scans are the cheapest check
+    if '\\' not in value and '"' not in value and '\n' not in value:
+        return value
+    # Backslashes first, so the escapes added below are not escaped again;
+    # three str.replace scans beat one str.translate with these replacements
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
 
 class WriteError(Exception):
     """Custom exception for VictoriaMetrics write errors"""
@@ -29,7 +58,7 @@ class WriteError(Exception):
         super().__init__(f"Write failed with status {status_code}: {body}")
 
 
-@dataclass
+@dataclass(slots=True)
 class VMDataPoint:
     """
     Represents a single VictoriaMetrics data point.
@@ -46,6 +75,47 @@ class VMDataPoint:
     timestamp_ms: int
 
 
+class VMBatch:
+    """
+    Columnar buffer of data points for a single write.
+
+    Holds one list/array per field instead of one VMDataPoint per sample, so
+    filling a batch costs a few appends rather than an object and its dict.
+    Label dicts are stored by reference and must be treated as read-only.
+
+    Attributes:
+        metric_names: Metric name of each sample
+        labels: Label dict of each sample
+        values: Sample values
+        timestamps_ms: Sample timestamps in milliseconds since Unix epoch
+    """
+    __slots__ = ("metric_names", "labels", "values", "timestamps_ms")
+
+    def __init__(self):
+        self.metric_names: List[str] = []
+        self.labels: List[Dict[str, str]] = []
+        self.values = array('d')
+        self.timestamps_ms = array('q')
+
+    def append(self, metric_name: str, labels: Dict[str, str], value: float, timestamp_ms: int) -> None:
+        """Add one sample to the batch."""
+        self.metric_names.append(metric_name)
+        self.labels.append(labels)
+        self.values.append(value)
+        self.timestamps_ms.append(timestamp_ms)
+
+    @classmethod
+    def from_points(cls, points: List[VMDataPoint]) -> 'VMBatch':
+        """Build a batch from a list of VMDataPoints."""
+        batch = cls()
+        for point in points:
+            batch.append(point.metric_name, point.labels, point.value, point.timestamp_ms)
+        return batch
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
 class VMWriter:
     """
     VictoriaMetrics writer that batches and writes data points using the Prometheus text format.
@@ -54,41 +124,83 @@ class VMWriter:
     and comprehensive statistics tracking.
     """
 
-    def __init__(self, url: str, dry_run: bool = False, batch_size: int = 10000):
+    def __init__(
+        self,
+        url: str,
+        dry_run: bool = False,
+        batch_size: int = 5000,
+        max_connections: int = 1,
+        target_batch_bytes: Optional[int] = DEFAULT_TARGET_BATCH_BYTES,
+        compress: bool = False
+    ):
         """
         Initialize the VictoriaMetrics writer.
 
+        write_batch() may be called from several threads at once; they share
+        the session's keep-alive connection pool.
+
         Args:
             url: Base URL of VictoriaMetrics server (e.g., "http://vm:8428")
             dry_run: If True, validate but don't write data
-            batch_size: Number of points to write per batch (default: 10000)
+            batch_size: Points per batch when batch_limit() is called without
+                        a maximum (default: 5000)
+            max_connections: Keep-alive connections to pool, one per concurrent writer (default: 1)
+            target_batch_bytes: Request body size batch_limit() aims for, or None
+                                to only cap batches by point count (default: 1 MiB)
+            compress: gzip request bodies, trading client CPU for network bandwidth
         """
         self._url = url.rstrip('/')
         self._import_url = f"{self._url}/api/v1/import/prometheus"
         self._health_url = f"{self._url}/health"
         self._dry_run = dry_run
         self._batch_size = batch_size
+        self._compress = compress
 
-        # Statistics tracking
+        # Statistics tracking, guarded for concurrent write_batch() calls
         self._points_written = 0
         self._batches_sent = 0
+        self._stats_lock = threading.Lock()
+
+        # Observed request body bytes per point, used to size batches
+        self._target_batch_bytes = target_batch_bytes
+        self._bytes_per_point: Optional[float] = None
+
+        # (metric_name, id(labels)) -> (labels, b'metric{labels} '); label dicts
+        # are shared by the mapping caches, so identity is a stable key. The
+        # dict is held in the entry so its id cannot be reused while cached.
+        self._series_cache: Dict[Tuple[str, int], Tuple[Dict[str, str], bytes]] = {}
 
         # Configure session with retry logic
         self._session = requests.Session()
+        # Short, capped backoff (first retry immediate, then 1s, 2s) with
+        # jitter so parallel writers do not retry in lockstep; Retry-After
+        # on 429/503 still takes precedence
         retry_strategy = Retry(
             total=3,
-            backoff_factor=2,  # Exponential backoff: 2s, 4s, 8s
-            status_forcelist=[500, 502, 503, 504],
+            backoff_factor=_RETRY_BACKOFF_FACTOR,
+            backoff_max=_RETRY_BACKOFF_MAX,
+            backoff_jitter=_RETRY_BACKOFF_JITTER,
+            status_forcelist=[429, 500, 502, 503, 504],
             allowed_methods=["POST", "GET"]
         )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
+        pool_size = max(1, max_connections)
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=retry_strategy
+        )
         self._session.mount("http://", adapter)
         self._session.mount("https://", adapter)
 
+        # Health checks get their own session without retries, so they fail
+        # fast and never queue behind an import on the writers' pool
+        self._health_session = requests.Session()
+
         if self._dry_run:
             logger.info("VMWriter initialized in DRY-RUN mode - no data will be written")
         else:
-            logger.info(f"VMWriter initialized: {self._url}, batch_size={self._batch_size}")
+            logger.info(f"VMWriter initialized: {self._url}, batch_size={self._batch_size}, "
+                        f"compress={self._compress}")
 
     def format_prometheus_line(self, point: VMDataPoint) -> str:
         """
@@ -103,26 +215,59 @@ class VMWriter:
         Returns:
             Prometheus text format line
         """
-        # Escape label values (handle quotes, backslashes, newlines)
-        def escape_label_value(value: str) -> str:
-            value = str(value)  # Ensure string type
-            value = value.replace('\\', '\\\\')  # Escape backslashes first
-            value = value.replace('"', '\\"')    # Escape quotes
-            value = value.replace('\n', '\\n')   # Escape newlines
-            return value
-
-        # Build label string
-        if point.labels:
-            label_parts = [f'{key}="{escape_label_value(value)}"'
-                          for key, value in sorted(point.labels.items())]
-            label_string = '{' + ','.join(label_parts) + '}'
-        else:
-            label_string = ''
+        return self._format_line(point.metric_name, point.labels, point.value, point.timestamp_ms)
 
+    @classmethod
+    def _format_line(cls, metric_name: str, labels: Dict[str, str], value: float, timestamp_ms: int) -> str:
+        """Format one sample as a Prometheus text format line."""
         # Format: metric_name{labels} value timestamp_ms
-        return f"{point.metric_name}{label_string} {point.value} {point.timestamp_ms}"
+        return f"{cls._format_series(metric_name, labels)} {value} {timestamp_ms}"
+
+    @staticmethod
+    def _format_series(metric_name: str, labels: Dict[str, str]) -> str:
+        """Format the metric_name{labels} part of a Prometheus text format line."""
+        if not labels:
+            return metric_name
+        label_parts = [f'{key}="{_escape_label_value(value)}"'
+                       for key, value in sorted(labels.items())]
+        return f"{metric_name}{{{','.join(label_parts)}}}"
+
+    def _series_prefix(self, metric_name: str, labels: Dict[str, str]) -> bytes:
+        """Return the encoded b'metric_name{labels} ' prefix, formatting it once per series."""
+        key = (metric_name, id(labels))
+        entry = self._series_cache.get(key)
+        if entry is not None and entry[0] is labels:
+            return entry[1]
+
+        prefix = (self._format_series(metric_name, labels) + ' ').encode('utf-8')
+        if len(self._series_cache) >= _MAX_CACHED_SERIES:
+            self._series_cache.clear()
+        self._series_cache[key] = (labels, prefix)
+        return prefix
+
+    def _encode_batch(self, batch: VMBatch) -> bytes:
+        """
+        Serialize a batch to a Prometheus text format request body.
 
-    def write_batch(self, points: List[VMDataPoint]) -> int:
+        Each line is a cached series prefix plus b'value timestamp_ms\\n', joined
+        into the body in one bytes.join; no per-line str is built or re-encoded.
+
+        Lines are ordered by series, then timestamp, so VictoriaMetrics ingests
+        each series' samples sequentially. Query results already arrive mostly
+        grouped per series, which keeps the sort close to linear.
+        """
+        prefixes = map(self._series_prefix, batch.metric_names, batch.labels)
+        rows = sorted(zip(prefixes, batch.timestamps_ms, batch.values))
+
+        parts = []
+        append = parts.append
+        for prefix, timestamp_ms, value in rows:
+            append(prefix)
+            # %r of a float is its repr, matching the str.format output
+            append(b'%r %d\n' % (value, timestamp_ms))
+        return b''.join(parts)
+
+    def write_batch(self, points: Union[VMBatch, List[VMDataPoint]]) -> int:
         """
         Write a batch of data points to VictoriaMetrics.
 
@@ -130,7 +275,7 @@ class VMWriter:
         Logs sample data points for verification.
 
         Args:
-            points: List of VMDataPoint objects to write
+            points: VMBatch, or list of VMDataPoint objects, to write
 
         Returns:
             Number of points written (or would-be-written in dry-run)
@@ -143,33 +288,45 @@ class VMWriter:
             return 0
 
         # Format all points as Prometheus text
-        lines = [self.format_prometheus_line(point) for point in points]
-        payload = '\n'.join(lines)
+        batch = points if isinstance(points, VMBatch) else VMBatch.from_points(points)
+        payload = self._encode_batch(batch)
+        self._observe_payload(len(payload), len(batch))
 
         if self._dry_run:
             # Dry-run mode: log samples but don't write
-            sample_count = min(3, len(lines))
-            logger.info(f"[DRY-RUN] Would write batch of {len(points)} points:")
+            sample_count = min(3, len(batch))
+            logger.info(f"[DRY-RUN] Would write batch of {len(batch)} points:")
             for i in range(sample_count):
-                logger.info(f"  Sample {i+1}: {lines[i][:200]}...")  # Truncate long lines
+                line = self._format_line(
+                    batch.metric_names[i], batch.labels[i], batch.values[i], batch.timestamps_ms[i]
+                )
+                logger.info(f"  Sample {i+1}: {line[:200]}...")  # Truncate long lines
 
-            if len(lines) > sample_count:
-                logger.info(f"  ... and {len(lines) - sample_count} more points")
+            if len(batch) > sample_count:
+                logger.info(f"  ... and {len(batch) - sample_count} more points")
 
             # Update statistics
-            self._points_written += len(points)
-            self._batches_sent += 1
+            self._record_batch(len(points))
 
             return len(points)
 
-        # Real write mode
+        # Real write mode; compression runs on the calling writer thread,
+        # and zlib releases the GIL while it works
+        headers = {'Content-Type': 'text/plain'}
+        body = payload
+        if self._compress:
+            body = gzip.compress(payload, compresslevel=_GZIP_LEVEL)
+            headers['Content-Encoding'] = 'gzip'
+
         try:
-            logger.debug(f"Writing batch of {len(points)} points to {self._import_url}")
+            # f-strings are formatted even when DEBUG is disabled, so check first
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Writing batch of {len(points)} points to {self._import_url}")
 
             response = self._session.post(
                 self._import_url,
-                data=payload.encode('utf-8'),
-                headers={'Content-Type': 'text/plain'},
+                data=body,
+                headers=headers,
                 timeout=30
             )
 
@@ -179,11 +336,10 @@ class VMWriter:
                 raise WriteError(response.status_code, error_body)
 
             # Success
-            self._points_written += len(points)
-            self._batches_sent += 1
+            points_written, batches_sent = self._record_batch(len(points))
 
-            logger.info(f"Successfully wrote batch of {len(points)} points "
-                       f"(total: {self._points_written:,} points in {self._batches_sent} batches)")
+            logger.info(f"Successfully wrote batch of {len(points)} points ({len(body):,} bytes) "
+                       f"(total: {points_written:,} points in {batches_sent} batches)")
 
             return len(points)
 
@@ -200,17 +356,66 @@ class VMWriter:
             logger.error(f"Unexpected error writing to VictoriaMetrics: {e}")
             raise
 
+    def _record_batch(self, count: int) -> Tuple[int, int]:
+        """
+        Add a written batch to the statistics.
+
+        Args:
+            count: Number of points in the batch
+
+        Returns:
+            Tuple of (total points written, total batches sent) after the update
+        """
+        with self._stats_lock:
+            self._points_written += count
+            self._batches_sent += 1
+            return self._points_written, self._batches_sent
+
+    def _observe_payload(self, payload_bytes: int, count: int) -> None:
+        """Fold a batch's body size into the running bytes-per-point average."""
+        if not count:
+            return
+        observed = payload_bytes / count
+        with self._stats_lock:
+            if self._bytes_per_point is None:
+                self._bytes_per_point = observed
+            else:
+                self._bytes_per_point += _BYTES_PER_POINT_SMOOTHING * (observed - self._bytes_per_point)
+
+    def batch_limit(self, max_points: Optional[int] = None) -> int:
+        """
+        Number of points the next batch should hold.
+
+        Until a batch has been written, or without a byte target, this is
+        max_points; afterwards it is lowered so the request body stays near
+        target_batch_bytes given the observed bytes per point.
+
+        Args:
+            max_points: Upper bound on points per batch; defaults to the
+                        writer's batch_size
+
+        Returns:
+            Points per batch, at least 1
+        """
+        if max_points is None:
+            max_points = self._batch_size
+        bytes_per_point = self._bytes_per_point
+        if self._target_batch_bytes is None or not bytes_per_point:
+            return max_points
+        return max(1, min(max_points, int(self._target_batch_bytes / bytes_per_point)))
+
     def health_check(self) -> bool:
         """
         Check if VictoriaMetrics is reachable and healthy.
 
-        Calls the /health endpoint to verify connectivity.
+        Calls the /health endpoint to verify connectivity. The request is
+        never retried, so an unhealthy server is reported within the timeout.
 
         Returns:
             True if VictoriaMetrics is healthy, False otherwise
         """
         try:
-            response = self._session.get(self._health_url, timeout=5)
+            response = self._health_session.get(self._health_url, timeout=5)
 
             if response.status_code == 200:
                 logger.info(f"Health check passed: {self._health_url}")
@@ -240,11 +445,13 @@ class VMWriter:
 
     def reset_stats(self):
         """Reset statistics counters."""
-        self._points_written = 0
-        self._batches_sent = 0
+        with self._stats_lock:
+            self._points_written = 0
+            self._batches_sent = 0
         logger.info("Statistics reset")
 
     def close(self):
-        """Close the underlying HTTP session."""
+        """Close the underlying HTTP sessions."""
         self._session.close()
+        self._health_session.close()
         logger.debug("VMWriter session closed")